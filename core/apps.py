@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from . import permission_cache  # noqa: F401 — connects the invalidation signals
+        from . import checks, role_groups  # noqa: F401
@@ -7,18 +7,33 @@ from tenant_db.models import User
 from .roles import RoleChoices
 
 # core/serializers.py
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework.exceptions import AuthenticationFailed
+from core.revoked_tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from core.permission_cache import get_permission_version, get_user_permissions
+
+
+def add_user_claims(token, user):
+    """Claims core.authentication.ClaimsJWTAuthentication builds request.user from."""
+    token["username"] = user.username
+    token["role"] = user.role
+    token["roles"] = [g.name for g in user.groups.all()]
+    token["permissions"] = sorted(get_user_permissions(user))
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+    token["perm_version"] = get_permission_version(user.pk)
+    return token
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
-        token["username"] = user.username
-        token["roles"] = [g.name for g in user.groups.all()]
-        token["permissions"] = list(user.get_all_permissions())
-        return token
+        return add_user_claims(token, user)
 
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -27,6 +42,37 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-issues the access token with current claims, so refreshing fixes a
+    stale token. Mirrors TokenRefreshSerializer.validate, decoding the
+    refresh token and loading the user once.
+    """
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM, None)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        data = {"access": str(add_user_claims(refresh.access_token, user))}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    pass  # blacklist app not installed
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data
+
+
 class UserRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
     role = serializers.ChoiceField(choices=RoleChoices.as_choices())
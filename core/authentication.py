@@ -0,0 +1,64 @@
+# core/authentication.py
+"""
+Stateless JWT authentication from the claims CustomTokenObtainPairSerializer
+signs into every token (role, roles, permissions, is_staff, is_superuser).
+
+request.user is a ClaimsUser built from the token: no User row is loaded and
+permission checks read the `permissions` claim. The `perm_version` claim
+must match the user's current permission version stamps
+(core.permission_cache), read from the cache, so tokens issued before a
+role or permission change are rejected and the client refreshes them.
+
+Enable with:
+    REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"] = ("core.authentication.ClaimsJWTAuthentication",)
+"""
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from core.permission_cache import get_permission_version
+
+
+class ClaimsUser(TokenUser):
+    """A user backed by validated token claims. The User row is only loaded if `.instance` is used."""
+
+    @cached_property
+    def role(self):
+        return self.token.get("role")
+
+    @cached_property
+    def roles(self):
+        return list(self.token.get("roles", []))
+
+    @cached_property
+    def permissions(self):
+        return frozenset(self.token.get("permissions", []))
+
+    @cached_property
+    def instance(self):
+        return get_user_model().objects.get(pk=self.id)
+
+    def get_all_permissions(self, obj=None):
+        return set(self.permissions)
+
+    def has_perm(self, perm, obj=None):
+        return self.is_superuser or perm in self.permissions
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        return self.is_superuser or any(perm.startswith(f"{module}.") for perm in self.permissions)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        user = ClaimsUser(validated_token)
+        if validated_token.get("perm_version") != get_permission_version(user.id):
+            raise InvalidToken("Token permissions are out of date", code="permissions_stale")
+        return user
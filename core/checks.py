@@ -0,0 +1,21 @@
+# core/checks.py
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Version stamps only invalidate across workers through a shared cache."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if settings.DEBUG or not backend.endswith("LocMemCache"):
+        return []
+    return [
+        Warning(
+            "The default cache is per-process (LocMemCache).",
+            hint=(
+                "Set CACHE_URL to a shared cache such as Redis: permission, role and /me "
+                "invalidation and JWT perm_version checks rely on it across workers."
+            ),
+            id="core.W001",
+        )
+    ]
@@ -0,0 +1,37 @@
+# core/management/commands/prune_tokens.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted tokens in batches (short locks, no huge transaction)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Tokens deleted per statement")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        start = time.monotonic()
+        deleted = blacklisted = 0
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            # Cascades to the blacklist entries of the same tokens
+            _, counts = OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += counts.get(OutstandingToken._meta.label, 0)
+            blacklisted += counts.get(BlacklistedToken._meta.label, 0)
+            self.stdout.write(f"🧹 {deleted} expired token(s) deleted ({blacklisted} blacklisted)...")
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Pruned {deleted} outstanding and {blacklisted} blacklisted token(s) in {time.monotonic() - start:.2f}s"
+        ))
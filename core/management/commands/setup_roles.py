@@ -1,11 +1,61 @@
 # core/management/commands/setup_roles.py
-from django.core.management.base import BaseCommand
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django_tenants.utils import get_public_schema_name
+
 from core.utils import setup_roles_and_permissions
+from master_db.models import Client
+from master_db.sharding import shard_context
+
+
+def _setup_tenant(tenant):
+    """Runs in a worker thread, on that thread's own connections."""
+    start = time.monotonic()
+    try:
+        with shard_context(tenant):
+            created = setup_roles_and_permissions(verbose=False)
+    finally:
+        connections.close_all()
+    return created, time.monotonic() - start
 
 
 class Command(BaseCommand):
     help = "Set up role-based groups and permissions"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all-tenants", action="store_true", help="Set up every tenant schema, in parallel"
+        )
+        parser.add_argument("--workers", type=int, default=8, help="Tenants set up in parallel")
+
     def handle(self, *args, **options):
+        start = time.monotonic()
         setup_roles_and_permissions()
-        self.stdout.write("✅ Roles and permissions set up.")
\ No newline at end of file
+        self.stdout.write(f"✅ Roles and permissions set up. ({time.monotonic() - start:.2f}s)")
+        if options["all_tenants"]:
+            self._setup_all_tenants(options["workers"])
+
+    def _setup_all_tenants(self, workers):
+        tenants = list(Client.objects.exclude(schema_name=get_public_schema_name()))
+        self.stdout.write(f"🚀 Setting up {len(tenants)} tenant(s) with {workers} worker(s)...")
+        start = time.monotonic()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_setup_tenant, tenant): tenant for tenant in tenants}
+            for future in as_completed(futures):
+                tenant = futures[future]
+                try:
+                    created, seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"❌ {tenant.schema_name}: {e}")
+                    continue
+                summary = f"created {', '.join(created)}" if created else "up to date"
+                self.stdout.write(f"   {tenant.schema_name} on {tenant.shard}: {summary} ({seconds:.2f}s)")
+        elapsed = time.monotonic() - start
+        if failed:
+            raise CommandError(f"{failed} of {len(tenants)} tenant(s) failed ({elapsed:.2f}s)")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(tenants)} tenant(s) set up in {elapsed:.2f}s"))
@@ -1,31 +1,39 @@
 # core/middleware.py
 
-from django.db import connection
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
 from django.utils.deprecation import MiddlewareMixin
-from master_db.models import Client  # Your tenant model in master_db
+
+from core.tenant_connections import TenantPoolTimeout, tenant_connections
+from core.tenant_registry import dedicated_databases_enabled
+
 
 class TenantMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        # Example: Get tenant from subdomain
-        host = request.get_host().split(':')[0]  # Remove port
-        subdomain = host.split('.')[0]
+    """
+    Database-per-tenant mode (settings.TENANT_DEDICATED_DATABASES): checks
+    out a pooled connection to the tenant's own database for the duration of
+    the request. The tenant is the one CustomTenantMiddleware resolved from
+    the hostname; schema-only tenants are left to it.
+    """
 
-        if subdomain == 'www' or subdomain == 'localhost':
-            # Use default/master DB
-            return
+    def __init__(self, get_response):
+        if not dedicated_databases_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
 
+    def process_request(self, request):
+        tenant = getattr(request, 'tenant', None)
+        if tenant is None or not tenant.db_name:
+            return None
         try:
-            tenant = Client.objects.get(sub_domain=subdomain)
-            # Switch database connection to tenant's DB
-            connection.close()  # Close current connection
-            connection.settings_dict.update({
-                'NAME': tenant.db_name,
-                'USER': tenant.db_user,
-                'PASSWORD': tenant.db_password,
-                'HOST': tenant.db_host or 'localhost',
-                'PORT': tenant.db_port or '5432',
-            })
-            # Reconnect on next query
-        except Client.DoesNotExist:
-            # Handle invalid tenant
-            pass  # or raise 404
\ No newline at end of file
+            request.tenant_db_alias = tenant_connections.acquire(tenant)
+        except TenantPoolTimeout:
+            return HttpResponse("Tenant database busy, retry later", status=503)
+        return None
+
+    def process_response(self, request, response):
+        alias = getattr(request, 'tenant_db_alias', None)
+        if alias is not None:
+            tenant_connections.release(alias)
+            request.tenant_db_alias = None
+        return response
@@ -0,0 +1,117 @@
+# core/password_hashing.py
+"""
+Bounded executor for password hashing.
+
+PBKDF2 runs in a small thread pool (hashlib releases the GIL while it
+works), so a login burst can use at most PASSWORD_HASHING_WORKERS cores. At
+most PASSWORD_HASHING_MAX_QUEUE more calls may wait for a worker; beyond
+that, callers get PasswordHashingBusy (HTTP 429) at once instead of tying up
+a request worker in a queue. Outside DRF (the admin login),
+sampleDjango.middleware.PasswordHashingBusyMiddleware turns it into a
+plain 429. Rejections are logged with the pool's stats().
+
+OffloadedPBKDF2PasswordHasher, first in settings.PASSWORD_HASHERS, routes
+every hash and verify (login, register, set_password) through the pool.
+It keeps the "pbkdf2_sha256" algorithm name, so stored hashes are unchanged.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger('auth.hashing')
+
+
+class PasswordHashingBusy(Throttled):
+    default_detail = "Too many logins in progress, please retry shortly."
+
+
+class PasswordHashingPool:
+    def __init__(self, workers, max_queue, retry_after=1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing", initializer=self._mark_worker
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._total_hash = 0.0
+        self._max_hash = 0.0
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and return its result, or raise PasswordHashingBusy."""
+        if getattr(self._local, "worker", False):
+            return func(*args)  # e.g. verify() calling encode()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Password hashing at capacity; request rejected: %s", self.stats())
+            raise PasswordHashingBusy(wait=self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        submitted_at = time.monotonic()
+        try:
+            return self._executor.submit(self._timed, func, args, submitted_at).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _mark_worker(self):
+        self._local.worker = True
+
+    def _timed(self, func, args, submitted_at):
+        started_at = time.monotonic()
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            seconds = time.monotonic() - started_at
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self._total_wait += started_at - submitted_at
+                self._total_hash += seconds
+                self._max_hash = max(self._max_hash, seconds)
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+                "avg_hash_ms": round(self._total_hash / completed * 1000, 2),
+                "max_hash_ms": round(self._max_hash * 1000, 2),
+            }
+
+
+password_hashing = PasswordHashingPool(
+    workers=getattr(settings, "PASSWORD_HASHING_WORKERS", None) or os.cpu_count() or 1,
+    max_queue=getattr(settings, "PASSWORD_HASHING_MAX_QUEUE", 16),
+)
+
+
+class OffloadedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    def encode(self, password, salt, iterations=None):
+        return password_hashing.run(super().encode, password, salt, iterations)
+
+    def verify(self, password, encoded):
+        return password_hashing.run(super().verify, password, encoded)
@@ -0,0 +1,351 @@
+# core/permission_cache.py
+"""
+Compiled, cached permission sets.
+
+A user's permissions ("app_label.codename") are loaded in one query and
+compiled into an int bitset over a per-worker table of interned
+codenames, then kept in a per-worker LRU. Groups and permissions live in
+each tenant's schema, so entries and stamps are scoped by the current
+tenant schema. Each entry carries the version stamps it was built under:
+
+- a tenant stamp, bumped when the tenant's groups, permissions or group
+  permissions change
+- a per-user tenant stamp, bumped when the user's groups or direct
+  permissions in that tenant change, or a group or permission they hold does
+- a per-user stamp, bumped when the User row (shared by every tenant) changes
+
+Stamps live in Django's cache (settings.CACHES), so a bump in one process
+invalidates every worker sharing that cache. A permission check reads the
+stamps and tests a bit: no database queries while nothing changed. Entries
+are also rebuilt after PERMISSION_CACHE_TTL seconds, which bounds staleness
+when the cache is not shared (the per-process LocMem default).
+
+The permission catalog (every permission, for the role editor) is kept
+there too, as rendered JSON under a per-tenant catalog stamp that is bumped
+when the tenant's permissions are created or deleted, or its schema is
+migrated; the stamp doubles as the response ETag, so a revalidation is
+answered from the stamp alone.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.models import TokenUser
+
+from core.tenant_context import get_current_schema_name
+
+def _global_version_key():
+    return f"perm-version:{get_current_schema_name()}:global"
+
+
+def _user_version_key(user_id):
+    return f"perm-version:{get_current_schema_name()}:user:{user_id}"
+
+
+def _user_row_version_key(user_id):
+    return f"perm-version:user:{user_id}"
+
+
+def _catalog_version_key(schema=None):
+    return f"perm-version:{schema or get_current_schema_name()}:catalog"
+
+
+def _new_stamp():
+    return uuid.uuid4().hex
+
+
+def bump_global_version():
+    """The current tenant's groups or permissions changed."""
+    cache.set(_global_version_key(), _new_stamp(), None)
+
+
+def bump_user_version(*user_ids):
+    """The users' groups or permissions in the current tenant changed."""
+    cache.set_many({_user_version_key(user_id): _new_stamp() for user_id in user_ids}, None)
+
+
+def bump_user_row_version(*user_ids):
+    """The users' rows changed (e.g. role, is_active); affects every tenant."""
+    cache.set_many({_user_row_version_key(user_id): _new_stamp() for user_id in user_ids}, None)
+
+
+def bump_catalog_version(schema=None):
+    """The permissions of the current tenant (or of `schema`) changed."""
+    cache.set(_catalog_version_key(schema), _new_stamp(), None)
+
+
+def get_catalog_version():
+    return _get_stamps([_catalog_version_key()])[0]
+
+
+def _get_stamps(keys):
+    """Stamps for `keys`; one evicted from the cache is replaced, never reused."""
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, _new_stamp(), None)
+            stamps[key] = cache.get(key)
+    return tuple(stamps[key] for key in keys)
+
+
+def get_versions(user_id):
+    """(tenant stamp, user's tenant stamp, user row stamp) in the current tenant."""
+    return _get_stamps([_global_version_key(), _user_version_key(user_id), _user_row_version_key(user_id)])
+
+
+def get_permission_version(user_id):
+    """
+    The user's own stamps as one string, for the token claim. Not the tenant
+    stamp, which would stale every token in the tenant on any group edit:
+    group and permission changes bump the stamps of the users they affect.
+    """
+    return ":".join(_get_stamps([_user_version_key(user_id), _user_row_version_key(user_id)]))
+
+
+class PermissionCache:
+    """Per-worker LRU of (tenant schema, user id) -> (versions, permission bitset, expiry)."""
+
+    def __init__(self, max_size=4096, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bits = {}  # "app_label.codename" -> bit index
+        self._names = []  # bit index -> "app_label.codename"
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, perms):
+        """Bitset of the given permission names, interning new ones."""
+        bitset = 0
+        with self._lock:
+            for perm in perms:
+                index = self._bits.get(perm)
+                if index is None:
+                    index = self._bits[perm] = len(self._names)
+                    self._names.append(perm)
+                bitset |= 1 << index
+        return bitset
+
+    def names(self, bitset):
+        with self._lock:
+            return {name for index, name in enumerate(self._names) if bitset >> index & 1}
+
+    def bitset(self, user):
+        key = (get_current_schema_name(), user.pk)
+        versions = get_versions(user.pk)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        bitset = self.compile(self._load(user))
+        with self._lock:
+            self._entries[key] = (versions, bitset, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return bitset
+
+    def has_perm(self, user, perm):
+        if not user.is_active:
+            return False
+        if user.is_superuser:
+            return True
+        bitset = self.bitset(user)
+        with self._lock:
+            index = self._bits.get(perm)
+        # Not interned: no compiled set contains it, the user's included
+        return index is not None and bool(bitset >> index & 1)
+
+    def get_all_permissions(self, user):
+        if not user.is_active:
+            return set()
+        return self.names(self.bitset(user))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "interned": len(self._names),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    @staticmethod
+    def _load(user):
+        """The user's permission names, in one query (all of them for a superuser)."""
+        perms = Permission.objects.all()
+        if not user.is_superuser:
+            perms = perms.filter(Q(user=user) | Q(group__user=user)).distinct()
+        return [
+            f"{app_label}.{codename}"
+            for app_label, codename in perms.values_list("content_type__app_label", "codename")
+        ]
+
+
+permission_cache = PermissionCache(
+    max_size=getattr(settings, "PERMISSION_CACHE_MAX_SIZE", 4096),
+    ttl=getattr(settings, "PERMISSION_CACHE_TTL", 60),
+)
+
+
+def user_has_perm(user, perm):
+    """Cached equivalent of user.has_perm(perm) for the model backend."""
+    if not user.is_authenticated:
+        return False
+    if isinstance(user, TokenUser):
+        return user.has_perm(perm)  # answered from the token's claims
+    return permission_cache.has_perm(user, perm)
+
+
+def get_user_permissions(user):
+    """Cached equivalent of user.get_all_permissions()."""
+    if not user.is_authenticated:
+        return set()
+    if isinstance(user, TokenUser):
+        return user.get_all_permissions()
+    return permission_cache.get_all_permissions(user)
+
+
+def permission_catalog(version):
+    """JSON bytes listing every permission, rendered once per tenant and catalog version."""
+    key = f"perm-catalog:{get_current_schema_name()}:{version}"
+    body = cache.get(key)
+    if body is None:
+        rows = Permission.objects.order_by("id").values_list(
+            "id", "codename", "name", "content_type__app_label", "content_type__model"
+        )
+        body = JSONRenderer().render({
+            "permissions": [
+                {"id": pk, "codename": codename, "name": name, "app_label": app_label, "model": model}
+                for pk, codename, name, app_label, model in rows
+            ]
+        })
+        cache.set(key, body, getattr(settings, "PERMISSION_CATALOG_CACHE_TTL", 86400))
+    return body
+
+
+# Invalidation
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return  # every login; would make the token just issued stale
+    # is_active / is_superuser / role may have changed, in every tenant
+    bump_user_row_version(instance.pk)
+
+
+def _group_members(group_ids):
+    Membership = User.groups.through
+    return set(Membership.objects.filter(group_id__in=group_ids).values_list("user_id", flat=True))
+
+
+def _permission_holders(permission_id):
+    """Users holding the permission directly or through a group."""
+    GroupPermission = Group.permissions.through
+    UserPermission = User.user_permissions.through
+    # Evaluated here: group links live on the tenant's database, memberships on "default"
+    group_ids = list(GroupPermission.objects.filter(permission_id=permission_id).values_list("group_id", flat=True))
+    direct = UserPermission.objects.filter(permission_id=permission_id).values_list("user_id", flat=True)
+    return _group_members(group_ids) | set(direct)
+
+
+def _affected_users(sender, instance):
+    if sender is Group:
+        return _group_members([instance.pk])
+    return _permission_holders(instance.pk)
+
+
+def bump_group_members(*group_ids):
+    """The groups changed: bump their members' stamps, in one query."""
+    user_ids = _group_members(group_ids)
+    if user_ids:
+        bump_user_version(*user_ids)
+
+
+@receiver(pre_delete, sender=Group)
+@receiver(pre_delete, sender=Permission)
+def _collect_affected_users(sender, instance, **kwargs):
+    # The links are gone (cascade) by post_delete
+    instance._affected_user_ids = _affected_users(sender, instance)
+
+
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Permission)
+def _group_or_permission_changed(sender, instance, created=False, **kwargs):
+    bump_global_version()
+    if sender is Permission:
+        bump_catalog_version()
+    if created:
+        return  # nobody holds it yet
+    user_ids = getattr(instance, "_affected_user_ids", None)
+    if user_ids is None:
+        user_ids = _affected_users(sender, instance)
+    if user_ids:
+        bump_user_version(*user_ids)
+
+
+@receiver(post_migrate)
+def _permissions_migrated(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # create_permissions() bulk-creates, which sends no post_save; migrate_schemas
+    # sets the connection's schema, not the current tenant
+    bump_catalog_version(getattr(connections[using], "schema_name", None))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # permission.group_set.clear(): the groups are unknown afterwards
+        instance._affected_user_ids = _permission_holders(instance.pk)
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    bump_global_version()
+    if not reverse:
+        bump_group_members(instance.pk)
+    elif pk_set:
+        # permission.group_set.add(...)
+        bump_group_members(*pk_set)
+    elif getattr(instance, "_affected_user_ids", None):
+        bump_user_version(*instance._affected_user_ids)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def _user_memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # group.user_set.clear(): the users are unknown afterwards
+        instance._affected_user_ids = _affected_users(
+            Group if sender is User.groups.through else Permission, instance
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        bump_user_version(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...) / permission.user_set.remove(...)
+        bump_user_version(*pk_set)
+    elif getattr(instance, "_affected_user_ids", None):
+        bump_user_version(*instance._affected_user_ids)
@@ -1,6 +1,8 @@
 # core/permissions.py
 from rest_framework.permissions import BasePermission
 
+from core.permission_cache import user_has_perm
+
 
 class HasPermission(BasePermission):
     """
@@ -13,7 +15,7 @@ class HasPermission(BasePermission):
             return False
         if self.required_permission is None:
             return True
-        return request.user.has_perm(self.required_permission)
+        return user_has_perm(request.user, self.required_permission)
 
 
 # Shortcut classes
@@ -46,7 +48,7 @@ class HasContextualPermission(BasePermission):
             return False
         if self.required_permission is None:
             return True
-        return request.user.has_perm(self.required_permission)
+        return user_has_perm(request.user, self.required_permission)
 
     def has_object_permission(self, request, view, obj):
         """
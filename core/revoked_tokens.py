@@ -0,0 +1,161 @@
+# core/revoked_tokens.py
+"""
+Per-process filter of revoked (blacklisted) refresh token JTIs.
+
+A Bloom filter answers "certainly not revoked" without a query, which is
+the common case on refresh; only possible hits are confirmed against
+BlacklistedToken. The filter syncs incrementally (rows with an id above the
+last one seen) at most every REVOKED_TOKEN_SYNC_INTERVAL seconds, and is
+rebuilt from unexpired rows every REVOKED_TOKEN_REBUILD_INTERVAL seconds or
+when it outgrows its capacity, so pruned tokens stop costing false hits.
+Tokens blacklisted by this process are added immediately.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+SYNC_OVERLAP = 100
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+
+class RevokedTokenFilter:
+    def __init__(self, capacity=100_000, sync_interval=1.0, rebuild_interval=3600.0):
+        self.min_capacity = capacity
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(capacity)
+        self._last_id = 0
+        self._synced_at = None  # monotonic; None until first built
+        self._built_at = 0.0
+        self._ready = False  # until the first build, every check goes to the DB
+        self.negatives = 0
+        self.confirmed = 0
+        self.false_positives = 0
+
+    def add(self, jti):
+        with self._lock:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti):
+        self._refresh()
+        with self._lock:
+            maybe = not self._ready or jti in self._bloom
+        if not maybe:
+            self.negatives += 1
+            return False
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            self.confirmed += 1
+            return True
+        self.false_positives += 1
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": self._bloom.count,
+                "capacity": self._bloom.capacity,
+                "last_id": self._last_id,
+                "negatives": self.negatives,
+                "confirmed": self.confirmed,
+                "false_positives": self.false_positives,
+            }
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self.sync_interval:
+                return
+            rebuild = (
+                self._synced_at is None
+                or now - self._built_at >= self.rebuild_interval
+                or self._bloom.count > self._bloom.capacity  # false hits climb past capacity
+            )
+            self._synced_at = now  # concurrent callers keep using the current filter
+        if rebuild:
+            self._rebuild(now)
+        else:
+            self._sync()
+
+    def _sync(self):
+        with self._lock:
+            # Overlap: ids are assigned before commit, so a lower one can land late
+            since = self._last_id - SYNC_OVERLAP
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=since).order_by("id").values_list("id", "token__jti")
+        )
+        with self._lock:
+            for row_id, jti in rows:
+                self._bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+
+    def _rebuild(self, now):
+        last_id = BlacklistedToken.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+        jtis = BlacklistedToken.objects.filter(
+            id__lte=last_id, token__expires_at__gt=timezone.now()
+        ).values_list("token__jti", flat=True)
+        jtis = list(jtis)
+        bloom = BloomFilter(max(self.min_capacity, 2 * len(jtis)))
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._last_id = last_id
+            self._built_at = now
+        # Rows added since the aggregate above
+        self._sync()
+        self._ready = True
+
+
+revoked_tokens = RevokedTokenFilter(
+    capacity=getattr(settings, "REVOKED_TOKEN_FILTER_CAPACITY", 100_000),
+    sync_interval=getattr(settings, "REVOKED_TOKEN_SYNC_INTERVAL", 1.0),
+    rebuild_interval=getattr(settings, "REVOKED_TOKEN_REBUILD_INTERVAL", 3600.0),
+)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def _add_revoked(sender, instance, created, **kwargs):
+    if created:
+        revoked_tokens.add(instance.token.jti)
+
+
+class RefreshToken(BaseRefreshToken):
+    """Refresh token whose blacklist check goes through revoked_tokens."""
+
+    def check_blacklist(self):
+        if revoked_tokens.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
@@ -0,0 +1,246 @@
+# core/role_groups.py
+"""
+Role -> Group resolution, bulk role assignment and the role listing query.
+
+Group ids are cached per worker, per database and schema (auth follows the
+tenant router), under a per-tenant version stamp in Django's cache that is
+bumped when any group is saved or deleted, so a rename or delete in one
+worker is seen by every worker sharing the cache.
+
+Role listings are cached in Django's cache under a per-tenant version
+stamp, bumped whenever a group, a permission, a group's permissions or a
+group's members change, or a user (and so their memberships) is deleted.
+"""
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, OuterRef, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.permission_cache import bump_global_version, bump_group_members, bump_user_row_version, bump_user_version
+from core.roles import ROLE_TO_GROUP
+from core.tenant_context import get_current_schema_name
+
+
+def _group_ids_version_key():
+    return f"role-groups-version:{get_current_schema_name()}"
+
+
+def _group_ids_version():
+    key = _group_ids_version_key()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+class RoleGroupCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}  # (db alias, schema, group name) -> (version stamp, group id)
+
+    def group_id(self, role):
+        """Id of the role's group (created if missing), or None for a role without one."""
+        group_name = ROLE_TO_GROUP.get(role)
+        if not group_name:
+            return None
+        alias = router.db_for_write(Group)
+        key = (alias, getattr(connections[alias], "schema_name", None), group_name)
+        version = _group_ids_version()
+        with self._lock:
+            entry = self._ids.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        group_id = Group.objects.get_or_create(name=group_name)[0].pk
+        with self._lock:
+            self._ids[key] = (version, group_id)
+        return group_id
+
+    def clear(self):
+        """Drop the current tenant's ids, in every worker sharing the cache."""
+        cache.set(_group_ids_version_key(), uuid.uuid4().hex, None)
+        with self._lock:
+            self._ids.clear()
+
+
+role_groups = RoleGroupCache()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def _invalidate_role_groups(sender, **kwargs):
+    role_groups.clear()
+    bump_roles_version()
+
+
+def annotated_roles():
+    """Groups with sorted `permission_codenames`, in one query; see with_user_counts()."""
+    codenames = Permission.objects.filter(group=OuterRef("pk")).order_by("codename").values("codename")
+    return Group.objects.annotate(permission_codenames=ArraySubquery(codenames)).order_by("name", "id")
+
+
+def with_user_counts(groups):
+    """
+    Set `user_count` on each group, from one grouped count. Memberships
+    live with User on "default", not with the groups, so the count runs
+    there and is merged here rather than joined as a subquery.
+    """
+    groups = list(groups)
+    Membership = get_user_model().groups.through
+    counts = dict(
+        Membership.objects.filter(group_id__in=[group.pk for group in groups])
+        .order_by()
+        .values("group_id")
+        .annotate(n=Count("pk"))
+        .values_list("group_id", "n")
+    )
+    for group in groups:
+        group.user_count = counts.get(group.pk, 0)
+    return groups
+
+
+def _roles_version_key():
+    return f"roles-version:{get_current_schema_name()}"
+
+
+def get_roles_version():
+    key = _roles_version_key()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_roles_version():
+    """Invalidate the current tenant's cached role listings."""
+    cache.set(_roles_version_key(), uuid.uuid4().hex, None)
+
+
+def roles_cache_key(*parts):
+    return ":".join(["roles", _roles_version_key(), get_roles_version(), *map(str, parts)])
+
+
+def roles_cache_ttl():
+    return getattr(settings, "ROLE_LIST_CACHE_TTL", 300)
+
+
+@receiver([post_save, post_delete], sender=Permission)
+def _permission_changed(sender, **kwargs):
+    bump_roles_version()
+
+
+@receiver(post_delete, sender=get_user_model())
+def _user_deleted(sender, **kwargs):
+    # Its memberships go by cascade, which sends no m2m_changed
+    bump_roles_version()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def _role_membership_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_roles_version()
+
+
+def assign_role(user_ids, role):
+    """
+    Give every user in `user_ids` the role and only its group, as
+    User.save does for one user, in four statements however many users.
+    Returns the number of users updated.
+    """
+    User = get_user_model()
+    Membership = User.groups.through
+    group_id = role_groups.group_id(role)
+    with transaction.atomic():
+        user_ids = list(User.objects.filter(pk__in=list(user_ids)).values_list("pk", flat=True))
+        User.objects.filter(pk__in=user_ids).update(role=role)
+        if group_id is not None:
+            Membership.objects.filter(user_id__in=user_ids).exclude(group_id=group_id).delete()
+            Membership.objects.bulk_create(
+                [Membership(user_id=user_id, group_id=group_id) for user_id in user_ids],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+    # update() and bulk_create() send no signals
+    bump_user_version(*user_ids)
+    bump_user_row_version(*user_ids)
+    bump_roles_version()
+    return len(user_ids)
+
+
+def permission_ids(codenames):
+    """{codename: [permission ids]} for the codenames that exist, in one query."""
+    ids = defaultdict(list)
+    for codename, pk in Permission.objects.filter(codename__in=set(codenames)).values_list("codename", "id"):
+        ids[codename].append(pk)
+    return dict(ids)
+
+
+def diff_links(current, permissions):
+    """
+    The links to write to move groups from `current` to `permissions` (both
+    {group id: permission ids}): (stale {group id: ids}, new [(group id, id)]).
+    """
+    stale = {}
+    new = []
+    for group_id, wanted in permissions.items():
+        have = current.get(group_id, set())
+        if have - wanted:
+            stale[group_id] = have - wanted
+        new.extend((group_id, permission_id) for permission_id in sorted(wanted - have))
+    return stale, new
+
+
+def update_roles(names=None, permissions=None):
+    """
+    Rename groups ({group id: name}) and set their permissions ({group id:
+    permission ids}) in one transaction, inserting and deleting only the
+    links that change: at most five statements however many groups.
+    Returns (links added, links removed).
+    """
+    names = names or {}
+    permissions = {group_id: set(ids) for group_id, ids in (permissions or {}).items()}
+    GroupPermission = Group.permissions.through
+    alias = router.db_for_write(Group)
+    with transaction.atomic(using=alias):
+        if len(names) > 1:
+            # Unique names are checked row by row: park them first, so swaps pass
+            Group.objects.bulk_update([Group(id=group_id, name=uuid.uuid4().hex) for group_id in names], ["name"])
+        if names:
+            Group.objects.bulk_update([Group(id=group_id, name=name) for group_id, name in names.items()], ["name"])
+        current = defaultdict(set)
+        links = GroupPermission.objects.filter(group_id__in=permissions).values_list("group_id", "permission_id")
+        for group_id, permission_id in links:
+            current[group_id].add(permission_id)
+        stale, new = diff_links(current, permissions)
+        removed = 0
+        if stale:
+            condition = Q()
+            for group_id, permission_ids in stale.items():
+                condition |= Q(group_id=group_id, permission_id__in=permission_ids)
+            removed = GroupPermission.objects.filter(condition).delete()[0]
+        GroupPermission.objects.bulk_create(
+            [GroupPermission(group_id=group_id, permission_id=permission_id) for group_id, permission_id in new],
+            ignore_conflicts=True,
+        )
+        # bulk_update(), bulk_create() and delete() on the through model send no m2m signals
+        changed = set(names) | set(stale) | {group_id for group_id, _ in new}
+        if changed:
+            transaction.on_commit(lambda: _roles_updated(changed), using=alias)
+    return len(new), removed
+
+
+def _roles_updated(group_ids):
+    role_groups.clear()
+    bump_global_version()
+    bump_group_members(*group_ids)
+    bump_roles_version()
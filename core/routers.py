@@ -1,47 +1,38 @@
 # core/routers.py
+from django.conf import settings
+from django_tenants.routers import TenantSyncRouter
+
+from core.tenant_context import get_current_tenant
+from core.tenant_registry import dedicated_databases_enabled, tenant_databases
+
 
 class TenantRouter:
     """
-    A router to control all database operations on models in the tenant_db application.
+    Database-per-tenant mode (settings.TENANT_DEDICATED_DATABASES): sends
+    tenant apps to the current tenant's own database, registering its alias
+    on first use and keeping it held for the request (core.tenant_registry,
+    which evicts cold aliases LRU-first). An explicit `tenant` hint wins over
+    the current tenant.
+
+    Answers None for everything else, so CustomTenantSyncRouter routes
+    shared apps and schema-only tenants; migrations are answered by
+    ShardedTenantSyncRouter.
     """
 
-    route_app_labels = {'tenant_db'}
+    _apps = TenantSyncRouter()
 
     def db_for_read(self, model, **hints):
-        if model._meta.app_label in self.route_app_labels:
-            # Get current tenant from middleware/thread local/request
-            # This is simplified — you need to store current tenant info globally per request
-            return self.get_current_tenant_db()
-        return 'default'
+        return self._tenant_db(model, hints)
 
     def db_for_write(self, model, **hints):
-        if model._meta.app_label in self.route_app_labels:
-            return self.get_current_tenant_db()
-        return 'default'
-
-    def allow_relation(self, obj1, obj2, **hints):
-        # Allow relations if both models are in the same app or one is in master
-        if (
-            obj1._meta.app_label in self.route_app_labels and
-            obj2._meta.app_label in self.route_app_labels
-        ):
-            return True
-        elif (
-            obj1._meta.app_label not in self.route_app_labels and
-            obj2._meta.app_label not in self.route_app_labels
-        ):
-            return True
-        return None
-
-    def allow_migrate(self, db, app_label, model_name=None, **hints):
-        if app_label in self.route_app_labels:
-            # Only allow tenant models to migrate on tenant DBs
-            # You must run migrate manually per tenant DB
-            return db != 'default'
-        return db == 'default'
-
-    def get_current_tenant_db(self):
-        # You need to implement a way to get current tenant DB name
-        # e.g., from thread local storage set by middleware
-        # For demo, return a fixed name — YOU MUST IMPLEMENT THIS
-        return 'tenant_company_a'
\ No newline at end of file
+        return self._tenant_db(model, hints)
+
+    def _tenant_db(self, model, hints):
+        if not dedicated_databases_enabled():
+            return None
+        tenant = hints.get("tenant") or get_current_tenant()
+        if not getattr(tenant, "db_name", None):
+            return None
+        if not self._apps.app_in_list(model._meta.app_label, settings.TENANT_APPS):
+            return None
+        return tenant_databases.use(tenant)
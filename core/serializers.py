@@ -1,10 +1,9 @@
-from rest_framework import serializers
-from .models import User, Product, Order, OrderItem
 from decimal import Decimal
-from rest_framework import serializers
 
 from rest_framework import serializers
 
+from tenant_db.models import Order, OrderItem, Product
+
 
 class DynamicFieldsModelSerializer(serializers.ModelSerializer):
     """
@@ -31,6 +30,21 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
             for field_name in exclude:
                 self.fields.pop(field_name, None)
 
+    def model_field_names(self):
+        """
+        Model fields the remaining fields read, for `queryset.only()`, so
+        dropped columns are never fetched. Method fields declare theirs in
+        Meta.field_dependencies.
+        """
+        dependencies = getattr(self.Meta, "field_dependencies", {})
+        names = set()
+        for field_name, field in self.fields.items():
+            if field_name in dependencies:
+                names.update(dependencies[field_name])
+            elif field.source != "*":
+                names.add(field.source.split(".")[0])
+        return names
+
 
 class ProductSerializer(DynamicFieldsModelSerializer):
     is_expensive = serializers.SerializerMethodField()
@@ -46,6 +60,10 @@ class ProductSerializer(DynamicFieldsModelSerializer):
             "is_expensive",
             "discount_price",
         )
+        field_dependencies = {
+            "is_expensive": ("price",),
+            "discount_price": ("price",),
+        }
 
     def validate(self, attrs):
         if attrs.get("price") is not None and attrs["price"] < 20:
@@ -62,7 +80,7 @@ class ProductSerializer(DynamicFieldsModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if instance.price > 700:
+        if "price" in data and instance.price > 700:
             data["price"] = "Contact us for price"
         return data
 
@@ -0,0 +1,183 @@
+# core/tenant_connections.py
+"""
+Pooled connections for database-per-tenant mode.
+
+Each tenant database alias is registered once with the tenant registry
+(core/tenant_registry.py), which also decides when a cold tenant is evicted.
+Per alias, up to `max_connections` DatabaseWrappers are kept; a checked-out
+wrapper is installed as `connections[alias]` for the current thread only, and
+goes back to the pool (still connected) on release. Aliases stay pinned in the
+registry while anything is checked out or waiting.
+
+Schema-only tenants (no db_name) are not pooled: acquire() points their
+shard's connection (TENANT_DATABASE_ALIAS unless placed elsewhere) at their
+schema, and release() points it back at the public schema.
+
+Usage:
+    with tenant_connections.using_tenant(tenant):
+        Product.objects.all()
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.utils import load_backend
+
+from core.tenant_context import reset_current_tenant, set_current_tenant, tenant_db_alias
+from core.tenant_registry import tenant_databases
+
+
+class TenantPoolTimeout(Exception):
+    """No connection to the tenant database became free in time."""
+
+
+class _TenantPool:
+    def __init__(self, alias):
+        self.alias = alias
+        self.idle = []  # connected wrappers ready for checkout
+        self.size = 0  # wrappers handed out or idle
+        self.in_use = 0
+        self.waiting = 0
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class TenantConnectionManager:
+    def __init__(self, registry, max_connections=5, timeout=5.0):
+        self.registry = registry
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._pools = {}  # alias -> _TenantPool
+        registry.add_eviction_listener(self._drop_pool)
+
+    def acquire(self, tenant):
+        """
+        Check out a connection for the tenant and install it as
+        connections[alias] for this thread. Raises TenantPoolTimeout if the
+        tenant is at max_connections for longer than `timeout` seconds.
+        """
+        if not tenant.db_name:
+            alias = tenant_db_alias(tenant)
+            connections[alias].set_tenant(tenant)
+            return alias
+        start = time.monotonic()
+        deadline = start + self.timeout
+        alias = self.registry.register(tenant, pin=True)
+        try:
+            with self._cond:
+                pool = self._pools.get(alias)
+                if pool is None:
+                    pool = self._pools[alias] = _TenantPool(alias)
+                pool.waiting += 1
+                try:
+                    while not pool.idle and pool.size >= self.max_connections:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TenantPoolTimeout(
+                                f"No free connection for '{alias}' after {self.timeout}s"
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    pool.waiting -= 1
+
+                wrapper = pool.idle.pop() if pool.idle else None
+                if wrapper is None:
+                    pool.size += 1
+                pool.in_use += 1
+                waited = time.monotonic() - start
+                pool.acquisitions += 1
+                pool.total_wait += waited
+                pool.max_wait = max(pool.max_wait, waited)
+        except TenantPoolTimeout:
+            self.registry.unpin(alias)
+            raise
+
+        if wrapper is None:
+            try:
+                wrapper = self._create_connection(alias)
+            except Exception:
+                # Give the slot back, or the pool shrinks for good
+                with self._cond:
+                    pool.size -= 1
+                    pool.in_use -= 1
+                    self._cond.notify_all()
+                self.registry.unpin(alias)
+                raise
+            # Wrappers move between threads, but only one thread holds each at a time
+            wrapper.inc_thread_sharing()
+        else:
+            wrapper.close_if_unusable_or_obsolete()
+        connections[alias] = wrapper
+        return alias
+
+    def release(self, alias):
+        """Return this thread's connection for `alias` to the pool."""
+        if not self.registry.is_live(alias):
+            # A shard connection lent to a schema-only tenant
+            connections[alias].set_schema_to_public()
+            return
+        wrapper = connections[alias]
+        del connections[alias]
+        # Drops connections left in a broken transaction state; healthy ones stay open
+        wrapper.close_if_unusable_or_obsolete()
+        with self._cond:
+            # A pool with connections checked out is never evicted
+            pool = self._pools[alias]
+            pool.in_use -= 1
+            pool.idle.append(wrapper)
+            self._cond.notify_all()
+        self.registry.unpin(alias)
+
+    @contextmanager
+    def using_tenant(self, tenant):
+        """Check out the tenant's connection and make it the current tenant."""
+        alias = self.acquire(tenant)
+        token = set_current_tenant(tenant)
+        try:
+            yield alias
+        finally:
+            reset_current_tenant(token)
+            self.release(alias)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "tenants": len(self._pools),
+                "evictions": self.registry.evictions,
+                "pools": {
+                    alias: {
+                        "size": pool.size,
+                        "in_use": pool.in_use,
+                        "idle": len(pool.idle),
+                        "waiting": pool.waiting,
+                        "acquisitions": pool.acquisitions,
+                        "avg_wait": pool.total_wait / pool.acquisitions if pool.acquisitions else 0.0,
+                        "max_wait": pool.max_wait,
+                    }
+                    for alias, pool in self._pools.items()
+                },
+            }
+
+    def _drop_pool(self, alias):
+        # Registry eviction listener; evicted aliases have nothing checked out
+        with self._cond:
+            pool = self._pools.pop(alias, None)
+        for wrapper in pool.idle if pool else ():
+            wrapper.close()
+
+    @staticmethod
+    def _create_connection(alias):
+        db = connections.settings[alias]
+        # Pooled wrappers stay open between checkouts whatever CONN_MAX_AGE says
+        return load_backend(db["ENGINE"]).DatabaseWrapper({**db, "CONN_MAX_AGE": None}, alias)
+
+
+tenant_connections = TenantConnectionManager(
+    tenant_databases,
+    max_connections=getattr(settings, "TENANT_POOL_MAX_CONNECTIONS", 5),
+    timeout=getattr(settings, "TENANT_POOL_TIMEOUT", 5.0),
+)
@@ -0,0 +1,64 @@
+# core/tenant_context.py
+"""
+The "current tenant" for the running request, management command or job.
+
+Backed by a ContextVar, so every thread and every asyncio task sees its own
+value: asyncio tasks inherit the value of the code that created them, new
+threads start with no tenant. To hand the current tenant to a thread pool,
+submit `contextvars.copy_context().run` or set it again inside the worker.
+
+Usage:
+    with tenant_scope(tenant):
+        Product.objects.all()   # routed to the tenant's database
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# (tenant, db_alias) — the alias is resolved once on set so routers stay O(1)
+_current = ContextVar("current_tenant", default=(None, None))
+
+
+def tenant_db_alias(tenant):
+    """Database alias holding the tenant's data: its own database, else its shard."""
+    return (
+        getattr(tenant, "db_name", None)
+        or getattr(tenant, "shard", None)
+        or settings.TENANT_DATABASE_ALIAS
+    )
+
+
+def get_current_tenant():
+    return _current.get()[0]
+
+
+def get_current_schema_name():
+    """The current tenant's schema, or "public" outside a tenant; for scoping cache keys."""
+    tenant = get_current_tenant()
+    return tenant.schema_name if tenant is not None else "public"
+
+
+def get_current_tenant_db_alias():
+    return _current.get()[1]
+
+
+def set_current_tenant(tenant):
+    """Set the current tenant (None clears it). Returns a token for reset_current_tenant()."""
+    if tenant is None:
+        return _current.set((None, None))
+    return _current.set((tenant, tenant_db_alias(tenant)))
+
+
+def reset_current_tenant(token):
+    _current.reset(token)
+
+
+@contextmanager
+def tenant_scope(tenant):
+    """Run a block with `tenant` as the current tenant, restoring the previous one after."""
+    token = set_current_tenant(tenant)
+    try:
+        yield tenant
+    finally:
+        reset_current_tenant(token)
@@ -0,0 +1,214 @@
+# core/tenant_registry.py
+"""
+Registry of live tenant database aliases (database-per-tenant mode).
+
+Replaces adding entries to settings.DATABASES: configs are built from the
+Client row on first use and registered in `connections.settings`. At most
+`max_aliases` are live; beyond that the least recently used alias that is
+not pinned (e.g. by a pooled checkout or a running migration) is closed and
+forgotten. Eviction listeners are called outside the registry lock.
+
+Aliases handed to routers (resolve(), use(), connection()) stay pinned by
+the calling thread until release_thread(), which runs on request_finished,
+so an alias is never evicted under a request still using it. Connections a
+thread holds to evicted aliases are only closed there too, never mid-request.
+Long-running workers outside the request cycle call release_thread() after
+each unit of work.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished
+from django.db import connections
+from django.dispatch import receiver
+from django.utils.connection import ConnectionDoesNotExist
+
+from core.tenant_context import tenant_db_alias
+
+
+def dedicated_databases_enabled():
+    return getattr(settings, "TENANT_DEDICATED_DATABASES", False)
+
+
+class TenantDatabaseRegistry:
+    def __init__(self, max_aliases=50):
+        self.max_aliases = max_aliases
+        self._lock = threading.Lock()
+        self._live = OrderedDict()  # alias -> pin count, least recently used first
+        self._listeners = []
+        self._local = threading.local()  # per thread: aliases with a connection, aliases held
+        self.evictions = 0
+
+    def register(self, tenant, pin=False):
+        """Make the tenant's alias usable through `connections`. Returns the alias."""
+        if not tenant.db_name:
+            raise ImproperlyConfigured(f"Tenant '{tenant}' has no dedicated database")
+        alias = tenant_db_alias(tenant)
+        with self._lock:
+            if alias not in self._live:
+                connections.settings[alias] = self._database_config(tenant)
+                self._live[alias] = 0
+            self._live.move_to_end(alias)
+            if pin:
+                self._live[alias] += 1
+            evicted = self._evict_cold()
+        self._notify(evicted)
+        return alias
+
+    def resolve(self, alias):
+        """
+        Return `alias`, registering it from its Client row first if it is not
+        live, and hold it for this thread. Cheap when it is; used by routers
+        on every query. Statically configured aliases are returned as they are.
+        """
+        held = self._held_aliases()
+        with self._lock:
+            live = alias in self._live
+            if live:
+                self._live.move_to_end(alias)
+                if alias not in held:
+                    self._live[alias] += 1
+                    held.add(alias)
+            elif alias in connections.settings:
+                return alias
+        if not live:
+            from master_db.models import Client
+
+            self.use(Client.objects.get(db_name=alias))
+        self._thread_aliases().add(alias)
+        return alias
+
+    def use(self, tenant):
+        """register() the tenant and hold its alias for this thread until release_thread()."""
+        held = self._held_aliases()
+        alias = tenant_db_alias(tenant)
+        alias = self.register(tenant, pin=alias not in held)
+        held.add(alias)
+        self._thread_aliases().add(alias)
+        return alias
+
+    def release_thread(self):
+        """Drop this thread's holds, then close its connections to aliases evicted meanwhile."""
+        held = self._held_aliases()
+        if held:
+            with self._lock:
+                for alias in held:
+                    if self._live.get(alias):
+                        self._live[alias] -= 1
+                held.clear()
+                evicted = self._evict_cold()
+            self._notify(evicted)
+        self.close_evicted_connections()
+
+    def unpin(self, alias):
+        with self._lock:
+            if self._live.get(alias):
+                self._live[alias] -= 1
+            evicted = self._evict_cold()
+        self._notify(evicted)
+
+    @contextmanager
+    def pinned(self, tenant):
+        """Keep the tenant's alias live for the duration of the block."""
+        alias = self.register(tenant, pin=True)
+        try:
+            yield alias
+        finally:
+            self.unpin(alias)
+
+    def connection(self, tenant):
+        """This thread's connection to the tenant's database, held until release_thread()."""
+        return connections[self.use(tenant)]
+
+    def is_live(self, alias):
+        with self._lock:
+            return alias in self._live
+
+    def add_eviction_listener(self, listener):
+        """`listener(alias)` is called after an alias has been forgotten."""
+        self._listeners.append(listener)
+
+    def close_evicted_connections(self):
+        """Close this thread's connections to aliases evicted meanwhile; only between requests."""
+        aliases = self._thread_aliases()
+        for alias in [a for a in aliases if not self.is_live(a)]:
+            aliases.discard(alias)
+            try:
+                connections[alias].close()
+                del connections[alias]
+            except ConnectionDoesNotExist:
+                pass  # never opened in this thread
+
+    def stats(self):
+        with self._lock:
+            return {
+                "live": len(self._live),
+                "max_aliases": self.max_aliases,
+                "pinned": sum(1 for pins in self._live.values() if pins),
+                "evictions": self.evictions,
+            }
+
+    def _held_aliases(self):
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = set()
+        return held
+
+    def _thread_aliases(self):
+        aliases = getattr(self._local, "aliases", None)
+        if aliases is None:
+            aliases = self._local.aliases = set()
+        return aliases
+
+    def _evict_cold(self):
+        # Caller holds self._lock
+        evicted = []
+        for alias in list(self._live):
+            if len(self._live) <= self.max_aliases:
+                break
+            if self._live[alias]:
+                continue
+            del self._live[alias]
+            connections.settings.pop(alias, None)
+            settings.DATABASES.pop(alias, None)  # left behind by older code paths
+            evicted.append(alias)
+            self.evictions += 1
+        return evicted
+
+    def _notify(self, evicted):
+        # This thread's own connections to `evicted` are closed by release_thread()
+        for alias in evicted:
+            for listener in self._listeners:
+                listener(alias)
+
+    @staticmethod
+    def _database_config(tenant):
+        default_db = settings.DATABASES["default"]
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": tenant.db_name,
+            "USER": tenant.db_user or default_db["USER"],
+            "PASSWORD": tenant.db_password or default_db["PASSWORD"],
+            "HOST": tenant.db_host or default_db["HOST"],
+            "PORT": tenant.db_port or default_db["PORT"],
+            "OPTIONS": {"sslmode": getattr(settings, "TENANT_DATABASE_SSLMODE", "require")},
+            "TIME_ZONE": default_db.get("TIME_ZONE"),
+            "ATOMIC_REQUESTS": False,
+            "AUTOCOMMIT": default_db.get("AUTOCOMMIT", True),
+            "CONN_HEALTH_CHECKS": default_db.get("CONN_HEALTH_CHECKS", True),
+            "CONN_MAX_AGE": default_db.get("CONN_MAX_AGE", 0),
+            "TEST": {},
+        }
+
+
+tenant_databases = TenantDatabaseRegistry(
+    max_aliases=getattr(settings, "TENANT_DATABASES_MAX_LIVE", 50),
+)
+
+
+@receiver(request_finished)
+def _release_thread(sender, **kwargs):
+    tenant_databases.release_thread()
@@ -1,3 +1,652 @@
-from django.test import TestCase
+import base64
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import IntegrityError, router
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.exceptions import TokenError
+
+from core.middleware import TenantMiddleware
+from core.pagination import KeysetPagination
+from core.permission_cache import (
+    PermissionCache,
+    _global_version_key,
+    _user_row_version_key,
+    _user_version_key,
+    bump_catalog_version,
+    bump_global_version,
+    bump_group_members,
+    bump_user_row_version,
+    bump_user_version,
+    get_permission_version,
+)
+from core.revoked_tokens import RefreshToken, RevokedTokenFilter
+from core.role_groups import RoleGroupCache, annotated_roles, diff_links, get_roles_version, with_user_counts
+from core.roles import ROLE_TO_GROUP
+from core.routers import TenantRouter
+from core.tenant_connections import TenantConnectionManager, TenantPoolTimeout
+from core.tenant_context import get_current_schema_name, tenant_scope
+from core.tenant_registry import TenantDatabaseRegistry
+from core.views import BulkRoleAssignView, CurrentUserView, PermissionListView, RoleBatchUpdateView
+from tenant_db.models import Product
+
+
+def tenant(schema):
+    return SimpleNamespace(schema_name=schema, shard="tenant_db", db_name=None)
+
+
+class PermissionCacheTenantIsolationTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = PermissionCache()
+        self.user = SimpleNamespace(pk=1, is_active=True, is_superuser=False)
+        perms = {"acme": ["core.view_reports"], "globex": ["core.edit_invoices"]}
+        patcher = mock.patch.object(
+            PermissionCache, "_load", side_effect=lambda user: perms[get_current_schema_name()]
+        )
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_permissions_are_compiled_per_tenant(self):
+        with tenant_scope(tenant("acme")):
+            self.assertTrue(self.cache.has_perm(self.user, "core.view_reports"))
+            self.assertFalse(self.cache.has_perm(self.user, "core.edit_invoices"))
+        with tenant_scope(tenant("globex")):
+            self.assertFalse(self.cache.has_perm(self.user, "core.view_reports"))
+            self.assertTrue(self.cache.has_perm(self.user, "core.edit_invoices"))
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_a_bump_in_one_tenant_leaves_the_other_cached(self):
+        for schema in ("acme", "globex"):
+            with tenant_scope(tenant(schema)):
+                self.cache.bitset(self.user)
+        with tenant_scope(tenant("acme")):
+            bump_global_version()
+        with tenant_scope(tenant("globex")):
+            self.cache.bitset(self.user)
+        self.assertEqual(self.load.call_count, 2)
+        with tenant_scope(tenant("acme")):
+            self.cache.bitset(self.user)
+        self.assertEqual(self.load.call_count, 3)
+
+    def test_user_row_changes_reach_every_tenant(self):
+        versions = {}
+        for schema in ("acme", "globex"):
+            with tenant_scope(tenant(schema)):
+                versions[schema] = get_permission_version(self.user.pk)
+        bump_user_row_version(self.user.pk)
+        for schema in ("acme", "globex"):
+            with tenant_scope(tenant(schema)):
+                self.assertNotEqual(get_permission_version(self.user.pk), versions[schema])
+
+    def test_entries_expire(self):
+        self.cache.ttl = 0
+        with tenant_scope(tenant("acme")):
+            self.cache.bitset(self.user)
+            self.cache.bitset(self.user)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_claim_ignores_the_tenant_stamp(self):
+        with tenant_scope(tenant("acme")):
+            version = get_permission_version(self.user.pk)
+            bump_global_version()
+            self.assertEqual(get_permission_version(self.user.pk), version)
+
+    def test_group_changes_bump_their_members_only(self):
+        with tenant_scope(tenant("acme")):
+            versions = {pk: get_permission_version(pk) for pk in (1, 2)}
+            with mock.patch("core.permission_cache._group_members", return_value={1}):
+                bump_group_members(7)
+            self.assertNotEqual(get_permission_version(1), versions[1])
+            self.assertEqual(get_permission_version(2), versions[2])
+
+
+class RoleGroupCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("core.role_groups.Group.objects.get_or_create")
+        self.get_or_create = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.get_or_create.side_effect = lambda name: (SimpleNamespace(pk=len(self.get_or_create.mock_calls)), True)
+
+    def test_a_clear_in_one_worker_reaches_the_others(self):
+        role = next(role for role, group in ROLE_TO_GROUP.items() if group)
+        worker, other = RoleGroupCache(), RoleGroupCache()
+        with tenant_scope(tenant("acme")):
+            self.assertEqual(worker.group_id(role), 1)
+            self.assertEqual(worker.group_id(role), 1)
+            other.clear()
+            self.assertEqual(worker.group_id(role), 2)
+        self.assertEqual(self.get_or_create.call_count, 2)
+
+
+class UpdateRolesTests(SimpleTestCase):
+    def test_only_changed_links_are_written(self):
+        stale, new = diff_links({1: {10, 11}, 2: {20}}, {1: {11, 12}, 2: {20}, 3: {30}})
+        self.assertEqual(stale, {1: {10}})
+        self.assertEqual(new, [(1, 12), (3, 30)])
+
+    def test_unchanged_roles_write_nothing(self):
+        self.assertEqual(diff_links({1: {10}}, {1: {10}}), ({}, []))
+
+
+class RoleBatchUpdateValidationTests(SimpleTestCase):
+    def setUp(self):
+        self.names = {1: "Auditor", 2: "Clerk", 3: "Manager"}
+        self.objects = mock.MagicMock()
+        self.objects.filter.side_effect = self._filter
+        self.update_roles = mock.Mock(return_value=(0, 0))
+        for target, value in (
+            ("core.views.Group.objects", self.objects),
+            ("core.views.update_roles", self.update_roles),
+            ("core.views.permission_ids", lambda codenames: {}),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _filter(self, id__in=None, name__in=None):
+        result = mock.MagicMock()
+        if id__in is not None:
+            result.values_list.return_value = [(pk, self.names[pk]) for pk in id__in if pk in self.names]
+        else:
+            holders = {pk for pk, name in self.names.items() if name in set(name__in)}
+            result.exclude.side_effect = lambda id__in: mock.Mock(
+                exists=mock.Mock(return_value=bool(holders - set(id__in)))
+            )
+        return result
+
+    def post(self, roles):
+        request = APIRequestFactory().post("/roles/batch/", {"roles": roles}, format="json")
+        force_authenticate(request, SimpleNamespace(is_authenticated=True, is_superuser=True))
+        return RoleBatchUpdateView.as_view()(request)
+
+    def test_renames_may_swap(self):
+        response = self.post([{"id": 1, "name": "Clerk"}, {"id": 2, "name": "Auditor"}])
+        self.assertEqual(response.status_code, 200)
+        self.update_roles.assert_called_once_with({1: "Clerk", 2: "Auditor"}, {})
+
+    def test_a_name_held_by_another_role_is_rejected(self):
+        response = self.post([{"id": 1, "name": "Manager"}])
+        self.assertEqual(response.status_code, 400)
+        self.update_roles.assert_not_called()
+
+    def test_duplicate_new_names_are_rejected(self):
+        response = self.post([{"id": 1, "name": "Owner"}, {"id": 2, "name": "Owner"}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_ids_must_be_integers_not_booleans(self):
+        for role_id in (True, "1", None):
+            self.assertEqual(self.post([{"id": role_id, "name": "Owner"}]).status_code, 400, role_id)
+
+    def test_a_constraint_violation_is_a_400(self):
+        self.update_roles.side_effect = IntegrityError
+        response = self.post([{"id": 1, "name": "Owner"}])
+        self.assertEqual(response.status_code, 400)
+
+
+class CurrentUserETagTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(CurrentUserView, "payload", return_value={"id": 1})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, schema, etag=""):
+        request = APIRequestFactory().get("/me/", HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, SimpleNamespace(id=1, is_authenticated=True))
+        with tenant_scope(tenant(schema)):
+            return CurrentUserView.as_view()(request)
+
+    def test_unchanged_is_a_304(self):
+        etag = self.get("acme")["ETag"]
+        self.assertEqual(self.get("acme", etag).status_code, 304)
+
+    def test_etags_are_per_tenant(self):
+        etag = self.get("acme")["ETag"]
+        self.assertNotEqual(self.get("globex")["ETag"], etag)
+        self.assertEqual(self.get("globex", etag).status_code, 200)
+
+    def test_a_bump_changes_the_etag(self):
+        etag = self.get("acme")["ETag"]
+        with tenant_scope(tenant("acme")):
+            bump_user_version(1)
+        self.assertEqual(self.get("acme", etag).status_code, 200)
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    def setUp(self):
+        self.paginator = KeysetPagination()
+        self.at = datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+    def request(self, **params):
+        return Request(APIRequestFactory().get("/products/", params))
+
+    def test_cursors_round_trip(self):
+        cursor = self.paginator.encode_cursor(SimpleNamespace(created_at=self.at, pk=42))
+        self.assertEqual(self.paginator.decode_cursor(cursor), (self.at, 42))
+
+    def test_invalid_cursors_are_404s(self):
+        bad = [
+            "not base64!",
+            base64.urlsafe_b64encode(b"no separator").decode(),
+            base64.urlsafe_b64encode(b"yesterday|1").decode(),
+            base64.urlsafe_b64encode(b"2026-01-02T03:04:05|x").decode(),
+            base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+        ]
+        for cursor in bad:
+            with self.assertRaises(NotFound, msg=cursor):
+                self.paginator.paginate_queryset(mock.MagicMock(), self.request(cursor=cursor))
+
+    def test_rows_tied_on_created_at_continue_by_id(self):
+        queryset = mock.MagicMock()
+        cursor = self.paginator.encode_cursor(SimpleNamespace(created_at=self.at, pk=42))
+        self.paginator.paginate_queryset(queryset, self.request(cursor=cursor))
+        (condition,), _ = queryset.filter.call_args
+        self.assertEqual(condition, Q(created_at__lt=self.at) | Q(created_at=self.at, pk__lt=42))
+        queryset.filter.return_value.order_by.assert_called_once_with("-created_at", "-pk")
+
+    def test_the_extra_row_only_sets_the_next_cursor(self):
+        rows = [SimpleNamespace(created_at=self.at, pk=pk) for pk in (5, 4, 3)]
+        queryset = mock.MagicMock()
+        queryset.order_by.return_value.__getitem__.side_effect = lambda s: rows[s]
+        page = self.paginator.paginate_queryset(queryset, self.request(page_size=2))
+        self.assertEqual([row.pk for row in page], [5, 4])
+        self.assertEqual(self.paginator.decode_cursor(self.paginator.next_cursor), (self.at, 4))
+        self.paginator.paginate_queryset(queryset, self.request(page_size=3))
+        self.assertIsNone(self.paginator.next_cursor)
+
+
+class RoleListingQueryTests(SimpleTestCase):
+    def test_member_counts_are_not_joined_across_databases(self):
+        roles = annotated_roles()
+        self.assertEqual(roles.db, "tenant_db")
+        self.assertNotIn(get_user_model().groups.through._meta.db_table, str(roles.query))
+
+    def test_member_counts_are_merged_from_default(self):
+        groups = [SimpleNamespace(pk=1), SimpleNamespace(pk=2)]
+        with mock.patch.object(get_user_model().groups.through, "objects") as objects:
+            counted = objects.filter.return_value.order_by.return_value.values.return_value.annotate.return_value
+            counted.values_list.return_value = [(1, 3)]
+            self.assertEqual([group.user_count for group in with_user_counts(groups)], [3, 0])
+        objects.filter.assert_called_once_with(group_id__in=[1, 2])
+        self.assertEqual(router.db_for_read(get_user_model().groups.through), "default")
+
+    def test_deleting_a_user_invalidates_role_listings(self):
+        with tenant_scope(tenant("acme")):
+            version = get_roles_version()
+            post_delete.send(sender=get_user_model(), instance=get_user_model()(pk=1))
+            self.assertNotEqual(get_roles_version(), version)
+
+
+class PermissionCatalogTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("core.views.permission_catalog", return_value=b'{"permissions": []}')
+        self.catalog = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, schema, etag=""):
+        request = APIRequestFactory().get("/permissions/", HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, SimpleNamespace(id=1, is_authenticated=True))
+        with tenant_scope(tenant(schema)):
+            return PermissionListView.as_view()(request)
+
+    def test_revalidation_skips_the_body(self):
+        etag = self.get("acme")["ETag"]
+        self.assertEqual(self.get("acme", etag).status_code, 304)
+        self.assertEqual(self.catalog.call_count, 1)
+
+    def test_catalog_stamps_are_per_tenant(self):
+        etag = self.get("acme")["ETag"]
+        with tenant_scope(tenant("globex")):
+            bump_catalog_version()
+        self.assertEqual(self.get("acme", etag).status_code, 304)
+        self.assertNotEqual(self.get("globex")["ETag"], etag)
+        bump_catalog_version("acme")
+        self.assertEqual(self.get("acme", etag).status_code, 200)
+
+
+class BulkRoleAssignValidationTests(SimpleTestCase):
+    def setUp(self):
+        for target, kwargs in (
+            ("core.views.CanManageUsers.has_permission", {"return_value": True}),
+            ("core.views.assign_role", {"side_effect": lambda user_ids, role: len(user_ids)}),
+        ):
+            patcher = mock.patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, user_ids):
+        request = APIRequestFactory().post("/roles/assign/", {"role": "clerk", "user_ids": user_ids}, format="json")
+        force_authenticate(request, SimpleNamespace(is_authenticated=True))
+        return BulkRoleAssignView.as_view()(request)
+
+    def test_user_ids_must_be_integers_not_booleans(self):
+        for user_ids in ([True], [1, False], ["1"], 1):
+            self.assertEqual(self.post(user_ids).status_code, 400, user_ids)
+
+    def test_integer_ids_are_assigned(self):
+        response = self.post([1, 2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"role": "clerk", "updated": 2})
+
+
+class _BlacklistRows:
+    """Stands in for BlacklistedToken.objects over (id, jti, expires_at) rows."""
+
+    lookups = {
+        "id__gt": lambda row, value: row[0] > value,
+        "id__lte": lambda row, value: row[0] <= value,
+        "token__jti": lambda row, value: row[1] == value,
+        "token__expires_at__gt": lambda row, value: row[2] > value,
+    }
+    columns = {"id": 0, "token__jti": 1}
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = 0
+
+    def revoke(self, jti, expires_at=None):
+        expires_at = expires_at or datetime.now(timezone.utc) + timedelta(days=1)
+        self.rows.append((len(self.rows) + 1, jti, expires_at))
+
+    def aggregate(self, **kwargs):
+        self.queries += 1
+        return {"last_id": max((row[0] for row in self.rows), default=None)}
+
+    def filter(self, **kwargs):
+        rows = [row for row in self.rows if all(self.lookups[k](row, v) for k, v in kwargs.items())]
+        query = mock.Mock()
+        query.order_by.return_value = query
+        query.exists.side_effect = lambda: self._count(bool(rows))
+        query.values_list.side_effect = lambda *fields, flat=False: self._count([
+            row[self.columns[fields[0]]] if flat else tuple(row[self.columns[f]] for f in fields) for row in rows
+        ])
+        return query
+
+    def _count(self, result):
+        self.queries += 1
+        return result
+
+
+class RevokedTokenFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = _BlacklistRows()
+        patcher = mock.patch("core.revoked_tokens.BlacklistedToken.objects", self.rows)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.filter = RevokedTokenFilter(capacity=1000, sync_interval=0, rebuild_interval=3600)
+
+    def test_blacklisted_tokens_are_rejected_after_a_rebuild(self):
+        for i in range(50):
+            self.rows.revoke(f"revoked-{i}")
+        self.assertTrue(all(self.filter.is_revoked(f"revoked-{i}") for i in range(50)))
+
+    def test_blacklisted_tokens_are_rejected_after_a_sync(self):
+        self.filter.is_revoked("warm-up")  # first build
+        self.rows.revoke("late")
+        self.assertIs(self.filter.is_revoked("late"), True)
+
+    def test_tokens_blacklisted_below_the_last_id_seen_are_still_synced(self):
+        self.rows.revoke("a")
+        self.filter.is_revoked("warm-up")
+        # An id handed out earlier but committed after a later one
+        self.rows.rows.insert(0, (1, "slow-commit", datetime.now(timezone.utc) + timedelta(days=1)))
+        self.assertIs(self.filter.is_revoked("slow-commit"), True)
+
+    def test_a_filter_hit_is_confirmed_before_rejecting(self):
+        self.filter.is_revoked("warm-up")
+        self.filter.add("never-blacklisted")  # a hit the database does not back
+        self.assertIs(self.filter.is_revoked("never-blacklisted"), False)
+        self.assertEqual(self.filter.false_positives, 1)
+
+    def test_other_tokens_pass_without_a_confirming_query(self):
+        self.rows.revoke("revoked")
+        self.filter.is_revoked("warm-up")
+        self.filter.sync_interval = 3600
+        queries = self.rows.queries
+        self.assertIs(self.filter.is_revoked("valid"), False)
+        self.assertEqual(self.rows.queries, queries)
+
+    def test_refresh_tokens_check_the_filter(self):
+        with mock.patch("core.revoked_tokens.revoked_tokens.is_revoked", return_value=True):
+            token = RefreshToken()
+            with self.assertRaises(TokenError):
+                token.check_blacklist()
+
+
+class PermissionInvalidationTests(SimpleTestCase):
+    """Each kind of change bumps the stamp it affects, and the next check sees it."""
+
+    def setUp(self):
+        cache.clear()
+        self.cache = PermissionCache()
+        self.user = SimpleNamespace(pk=1, is_active=True, is_superuser=False)
+        self.perms = ["core.view_reports"]
+        patcher = mock.patch.object(PermissionCache, "_load", side_effect=lambda user: list(self.perms))
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scope = tenant_scope(tenant("acme"))
+        self.scope.__enter__()
+        self.addCleanup(self.scope.__exit__, None, None, None)
+        self.assertTrue(self.cache.has_perm(self.user, "core.view_reports"))
+
+    def stamps(self):
+        return {
+            "tenant": cache.get(_global_version_key()),
+            "user": cache.get(_user_version_key(1)),
+            "row": cache.get(_user_row_version_key(1)),
+        }
+
+    def assert_rechecked(self, before, bumped):
+        after = self.stamps()
+        self.assertEqual({name for name in before if before[name] != after[name]}, bumped)
+        self.perms = ["core.edit_invoices"]
+        self.assertFalse(self.cache.has_perm(self.user, "core.view_reports"))
+        self.assertTrue(self.cache.has_perm(self.user, "core.edit_invoices"))
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_unchanged_checks_are_cached(self):
+        self.perms = []
+        self.assertTrue(self.cache.has_perm(self.user, "core.view_reports"))
+        self.assertEqual(self.load.call_count, 1)
+
+    def test_a_group_change_bumps_its_members(self):
+        before = self.stamps()
+        with mock.patch("core.permission_cache._group_members", return_value={1}) as members:
+            post_save.send(sender=Group, instance=Group(pk=7, name="Auditor"), created=False)
+        members.assert_called_once_with([7])
+        self.assert_rechecked(before, {"tenant", "user"})
+
+    def test_a_group_permission_change_bumps_its_members(self):
+        before = self.stamps()
+        with mock.patch("core.permission_cache._group_members", return_value={1}):
+            m2m_changed.send(
+                sender=Group.permissions.through, instance=Group(pk=7), action="post_add",
+                reverse=False, model=Permission, pk_set={3},
+            )
+        self.assert_rechecked(before, {"tenant", "user"})
+
+    def test_a_permission_change_bumps_its_holders(self):
+        before = self.stamps()
+        with mock.patch("core.permission_cache._permission_holders", return_value={1}):
+            post_save.send(sender=Permission, instance=Permission(pk=3), created=False)
+        self.assert_rechecked(before, {"tenant", "user"})
+
+    def test_a_membership_change_bumps_the_user(self):
+        before = self.stamps()
+        m2m_changed.send(
+            sender=get_user_model().groups.through, instance=get_user_model()(pk=1), action="post_add",
+            reverse=False, model=Group, pk_set={7},
+        )
+        self.assert_rechecked(before, {"user"})
+
+    def test_a_user_row_change_bumps_the_row_stamp(self):
+        before = self.stamps()
+        post_save.send(sender=get_user_model(), instance=get_user_model()(pk=1), created=False)
+        self.assert_rechecked(before, {"row"})
+
+    def test_last_login_updates_bump_nothing(self):
+        before = self.stamps()
+        post_save.send(
+            sender=get_user_model(), instance=get_user_model()(pk=1), created=False,
+            update_fields=frozenset({"last_login"}),
+        )
+        self.assertEqual(self.stamps(), before)
+
+
+class TenantMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("core.middleware.tenant_connections")
+        self.connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connections.acquire.return_value = "acme_db"
+
+    def middleware(self):
+        return TenantMiddleware(lambda request: HttpResponse())
+
+    def request(self, db_name):
+        request = RequestFactory().get("/")
+        request.tenant = SimpleNamespace(schema_name="acme", shard="tenant_db", db_name=db_name)
+        return request
+
+    @override_settings(TENANT_DEDICATED_DATABASES=False)
+    def test_off_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware()
+
+    @override_settings(TENANT_DEDICATED_DATABASES=True)
+    def test_dedicated_tenants_hold_a_pooled_connection_for_the_request(self):
+        request = self.request("acme_db")
+        self.middleware()(request)
+        self.connections.acquire.assert_called_once_with(request.tenant)
+        self.connections.release.assert_called_once_with("acme_db")
+
+    @override_settings(TENANT_DEDICATED_DATABASES=True)
+    def test_schema_tenants_are_left_alone(self):
+        self.middleware()(self.request(None))
+        self.connections.acquire.assert_not_called()
+        self.connections.release.assert_not_called()
+
+    @override_settings(TENANT_DEDICATED_DATABASES=True)
+    def test_an_exhausted_pool_is_a_503(self):
+        self.connections.acquire.side_effect = TenantPoolTimeout
+        self.assertEqual(self.middleware()(self.request("acme_db")).status_code, 503)
+        self.connections.release.assert_not_called()
+
+
+class TenantConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = mock.Mock()
+        self.registry.register.return_value = "acme_db"
+        self.pool = TenantConnectionManager(self.registry, max_connections=1, timeout=0)
+        self.tenant = SimpleNamespace(schema_name="acme", shard="tenant_db", db_name="acme_db")
+
+    def test_a_failed_connect_gives_its_slot_back(self):
+        with mock.patch.object(TenantConnectionManager, "_create_connection", side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.pool.acquire(self.tenant)
+        self.assertEqual(self.pool.stats()["pools"]["acme_db"]["size"], 0)
+        self.assertEqual(self.pool.stats()["pools"]["acme_db"]["in_use"], 0)
+        self.registry.unpin.assert_called_once_with("acme_db")
+        # The one slot is free again
+        wrapper = mock.Mock()
+        with mock.patch.object(TenantConnectionManager, "_create_connection", return_value=wrapper), \
+                mock.patch("core.tenant_connections.connections") as connections:
+            self.assertEqual(self.pool.acquire(self.tenant), "acme_db")
+        connections.__setitem__.assert_called_once_with("acme_db", wrapper)
+
+
+def dedicated(name):
+    return SimpleNamespace(
+        schema_name=name, shard="tenant_db", db_name=f"{name}_db", db_user="", db_password="", db_host="", db_port=None
+    )
+
+
+class TenantDatabaseRegistryTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("core.tenant_registry.connections")
+        self.connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.connections.settings = {"default": {}}
+        self.registry = TenantDatabaseRegistry(max_aliases=2)
+        self.evicted = []
+        self.registry.add_eviction_listener(self.evicted.append)
+
+    def test_register_makes_the_alias_usable(self):
+        self.assertEqual(self.registry.register(dedicated("acme")), "acme_db")
+        self.assertEqual(self.connections.settings["acme_db"]["NAME"], "acme_db")
+        self.assertTrue(self.registry.is_live("acme_db"))
+
+    def test_the_least_recently_used_cold_alias_is_evicted(self):
+        for name in ("acme", "globex"):
+            self.registry.register(dedicated(name))
+        self.registry.resolve("acme_db")  # now the most recent
+        self.registry.release_thread()
+        self.registry.register(dedicated("initech"))
+        self.assertEqual(self.evicted, ["globex_db"])
+        self.assertNotIn("globex_db", self.connections.settings)
+        self.assertEqual(self.registry.stats()["evictions"], 1)
+
+    def test_aliases_held_by_a_request_are_not_evicted_until_it_ends(self):
+        self.registry.use(dedicated("acme"))
+        self.registry.register(dedicated("globex"))
+        self.registry.register(dedicated("initech"))
+        self.assertEqual(self.evicted, ["globex_db"])  # not acme, though less recently used
+        self.registry.register(dedicated("umbrella"))
+        self.assertTrue(self.registry.is_live("acme_db"))
+        self.registry.release_thread()
+        self.registry.register(dedicated("wayne"))
+        self.assertEqual(self.evicted, ["globex_db", "initech_db", "acme_db"])
+
+    def test_resolve_registers_a_cold_alias_from_its_client(self):
+        with mock.patch("master_db.models.Client.objects.get", return_value=dedicated("acme")) as get:
+            self.assertEqual(self.registry.resolve("acme_db"), "acme_db")
+            self.assertEqual(self.registry.resolve("acme_db"), "acme_db")
+        get.assert_called_once_with(db_name="acme_db")
+        self.assertTrue(self.registry.is_live("acme_db"))
+
+    def test_static_aliases_resolve_to_themselves(self):
+        self.assertEqual(self.registry.resolve("default"), "default")
+        self.assertFalse(self.registry.is_live("default"))
+
+
+class TenantRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = TenantRouter()
+        patcher = mock.patch("core.routers.tenant_databases")
+        self.registry = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry.use.side_effect = lambda tenant: tenant.db_name
+
+    @override_settings(TENANT_DEDICATED_DATABASES=True)
+    def test_tenant_apps_go_to_the_tenants_database(self):
+        with tenant_scope(dedicated("acme")):
+            self.assertEqual(self.router.db_for_read(Product), "acme_db")
+            self.assertEqual(self.router.db_for_write(Group), "acme_db")
+            self.assertIsNone(self.router.db_for_write(get_user_model()))
+        self.assertEqual(self.router.db_for_write(Product, tenant=dedicated("globex")), "globex_db")
+
+    @override_settings(TENANT_DEDICATED_DATABASES=True)
+    def test_schema_tenants_fall_through(self):
+        with tenant_scope(tenant("acme")):
+            self.assertIsNone(self.router.db_for_read(Product))
+        self.assertIsNone(self.router.db_for_read(Product))
+        self.registry.use.assert_not_called()
+
+    @override_settings(TENANT_DEDICATED_DATABASES=False)
+    def test_off_by_default(self):
+        with tenant_scope(dedicated("acme")):
+            self.assertIsNone(self.router.db_for_read(Product))
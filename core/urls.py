@@ -2,7 +2,7 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from master_db.views import TenantRegisterAPIView
+from master_db.views import ProvisioningJobStatusAPIView, TenantRegisterAPIView
 
 from . import views
 
@@ -18,6 +18,11 @@ urlpatterns = [
     path("permissions/", views.PermissionListView.as_view(), name="list_permissions"),
     path("roles/", views.RoleListView.as_view(), name="role_list"),
     path("roles/<int:role_id>/", views.RoleDetailView.as_view(), name="role_detail"),
+    path("roles/assign/", views.BulkRoleAssignView.as_view(), name="role_assign"),
+    path("roles/batch/", views.RoleBatchUpdateView.as_view(), name="role_batch"),
     path("register-company/", TenantRegisterAPIView.as_view(), name="register-company"),
     path('api/tenant/register/', TenantRegisterAPIView.as_view(), name='tenant-register'),
+    path("tenant/jobs/<int:job_id>/", ProvisioningJobStatusAPIView.as_view(), name="provisioning-job"),
+    # Catalog
+    path("products/", views.ProductListView.as_view(), name="product_list"),
 ]
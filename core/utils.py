@@ -2,58 +2,72 @@
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 
+from core.permission_cache import bump_catalog_version, bump_global_version
+from core.role_groups import bump_roles_version
 
-def setup_roles_and_permissions():
+
+def setup_roles_and_permissions(verbose=True):
     """
     Creates default groups and permissions on first run.
     Safe to call multiple times (idempotent).
     Does NOT delete or modify existing groups/permissions.
+
+    Runs a fixed number of queries however many permissions and groups
+    there are. Returns the names of the groups it created.
     """
-    from tenant_db.models import User
     from .roles import CUSTOM_PERMISSIONS
 
     # Step 1: Get or create content type for custom permissions
-    try:
-        content_type = ContentType.objects.get(app_label="core", model="user")
-    except ContentType.DoesNotExist:
-        content_type = ContentType.objects.create(
-            app_label="core", model="user", name="User"
-        )
+    content_type, _ = ContentType.objects.get_or_create(app_label="core", model="user")
 
     # Step 2: Create custom permissions (if they don't exist)
     # This ensures base permissions exist for role assignment
-    for perm in CUSTOM_PERMISSIONS:
-        Permission.objects.get_or_create(
-            codename=perm["codename"],
-            content_type=content_type,
-            defaults={"name": perm["name"]},
-        )
+    Permission.objects.bulk_create(
+        [
+            Permission(codename=perm["codename"], name=perm["name"], content_type=content_type)
+            for perm in CUSTOM_PERMISSIONS
+        ],
+        ignore_conflicts=True,
+    )
+
+    # Cached permission sets may be missing the new permissions (superusers)
+    bump_global_version()
+    bump_catalog_version()
 
     # Step 3: Create default groups and assign base permissions
     # Only if they don't exist (safe for production)
     from .roles import GROUP_PERMISSIONS  # Import here to avoid circular import
 
-    for group_name, perm_codenames in GROUP_PERMISSIONS.items():
-        group, created = Group.objects.get_or_create(name=group_name)
-
-        # Only assign permissions if group was just created
-        # This prevents overwriting admin changes
-        if created:
-            permission_objects = []
-            for codename in perm_codenames:
-                try:
-                    perm_obj = Permission.objects.get(
-                        codename=codename, content_type=content_type
-                    )
-                    permission_objects.append(perm_obj)
-                except Permission.DoesNotExist:
-                    continue  # Skip invalid perms
-
-            group.permissions.set(permission_objects)
-            print(
-                f"✅ Created group '{group_name}' with {len(permission_objects)} permission(s)"
-            )
-        else:
+    existing = set(Group.objects.filter(name__in=GROUP_PERMISSIONS).values_list("name", flat=True))
+    missing = [name for name in GROUP_PERMISSIONS if name not in existing]
+    if verbose:
+        for group_name in existing:
             print(
                 f"🔁 Group '{group_name}' already exists. Skipping permission assignment to allow admin customization."
             )
+    if not missing:
+        return []
+
+    Group.objects.bulk_create([Group(name=name) for name in missing], ignore_conflicts=True)
+    # Only assign permissions if group was just created
+    # This prevents overwriting admin changes
+    groups = dict(Group.objects.filter(name__in=missing).values_list("name", "id"))
+    codenames = {codename for name in missing for codename in GROUP_PERMISSIONS[name]}
+    permission_ids = dict(
+        Permission.objects.filter(content_type=content_type, codename__in=codenames).values_list("codename", "id")
+    )
+    GroupPermission = Group.permissions.through
+    links = []
+    for group_name in missing:
+        # Skip invalid perms
+        group_links = [
+            GroupPermission(group_id=groups[group_name], permission_id=permission_ids[codename])
+            for codename in GROUP_PERMISSIONS[group_name]
+            if codename in permission_ids
+        ]
+        links.extend(group_links)
+        if verbose:
+            print(f"✅ Created group '{group_name}' with {len(group_links)} permission(s)")
+    GroupPermission.objects.bulk_create(links, ignore_conflicts=True)
+    bump_roles_version()
+    return missing
@@ -1,18 +1,38 @@
 # core/views.py
+from itertools import chain
+
 from rest_framework.views import APIView
 from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, BasePermission
-from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, router, transaction
+from django.http import HttpResponse
+from django.conf import settings
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
 
 # JWT
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.authentication import ClaimsUser
+from core.permission_cache import get_catalog_version, get_permission_version, get_user_permissions, permission_catalog
+from core.permissions import CanManageUsers
+from core.role_groups import (
+    annotated_roles, assign_role, permission_ids, roles_cache_key, roles_cache_ttl, update_roles, with_user_counts,
+)
+from core.roles import RoleChoices
+from core.tenant_context import get_current_schema_name
 
 # Serializers (adjust import if needed)
 from core.auth_serializers import CustomTokenObtainPairSerializer, UserRegisterSerializer
+from core.pagination import KeysetPagination
+from core.serializers import ProductSerializer
+from tenant_db.models import Product
 
 
 # ------------------------------
@@ -37,7 +57,7 @@ class UserRegisterView(APIView):
             user = serializer.save()
 
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = CustomTokenObtainPairSerializer.get_token(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token),
@@ -58,17 +78,45 @@ class UserRegisterView(APIView):
 class CurrentUserView(APIView):
     """
     GET: Return current user info (for /me endpoint)
+
+    The rendered payload is cached per tenant and user under the user's own
+    permission stamps, which role, group and permission changes affecting
+    them bump; tenant, user and stamps are also the ETag, so an unchanged
+    /me is a 304 without a cache read.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        return Response({
-            "id": request.user.id,
-            "username": request.user.username,
-            "role": request.user.role,
-            "roles": [g.name for g in request.user.groups.all()],
-            "permissions": list(request.user.get_all_permissions()),
-        })
+        user = request.user
+        schema = get_current_schema_name()
+        version = get_permission_version(user.id)
+        etag = f'"{schema}-{user.id}-{version}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f"me:{schema}:{user.id}:{version}"
+            body = cache.get(key)
+            if body is None:
+                body = JSONRenderer().render(self.payload(user))
+                cache.set(key, body, getattr(settings, 'CURRENT_USER_CACHE_TTL', 3600))
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @staticmethod
+    def payload(user):
+        if isinstance(user, ClaimsUser):
+            roles = user.roles
+        else:
+            roles = [g.name for g in user.groups.all()]
+        return {
+            "id": user.id,
+            "username": user.username,
+            "role": user.role,
+            "roles": roles,
+            "permissions": list(get_user_permissions(user)),
+        }
 
 
 # ------------------------------
@@ -95,35 +143,60 @@ class PermissionListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        permissions = []
-        for perm in Permission.objects.select_related('content_type').all():
-            permissions.append({
-                'id': perm.id,
-                'codename': perm.codename,
-                'name': perm.name,
-                'app_label': perm.content_type.app_label,
-                'model': perm.content_type.model,
-            })
-        return Response({'permissions': permissions})
+        # Pre-rendered and cached; polling clients revalidate with If-None-Match,
+        # answered from the catalog stamp without reading the body
+        version = get_catalog_version()
+        etag = f'"{version}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(permission_catalog(version), content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class RolePagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'roles': data,
+        })
+
+
+def role_payload(group):
+    """A group from annotated_roles() and with_user_counts() as returned by the role API."""
+    return {
+        'id': group.id,
+        'name': group.name,
+        'permissions': list(group.permission_codenames),
+        'user_count': group.user_count,
+    }
 
 
 class RoleListView(APIView):
     """
-    GET: List all roles (Groups)
+    GET: List roles (Groups), paginated (?page=, ?page_size=)
     POST: Create a new role
     """
     # permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
-        roles = []
-        for group in Group.objects.prefetch_related('permissions').all():
-            roles.append({
-                'id': group.id,
-                'name': group.name,
-                'permissions': [p.codename for p in group.permissions.all()],
-                'user_count': group.user_set.count(),
-            })
-        return Response({'roles': roles})
+        # Three queries per page (count, rows, member counts), cached per tenant until roles change
+        key = roles_cache_key('list', request.query_params.get('page', 1), request.query_params.get('page_size', ''))
+        data = cache.get(key)
+        if data is None:
+            paginator = RolePagination()
+            page = paginator.paginate_queryset(annotated_roles(), request, view=self)
+            data = paginator.get_paginated_response([role_payload(group) for group in with_user_counts(page)]).data
+            cache.set(key, data, roles_cache_ttl())
+        return Response(data)
 
     def post(self, request):
         name = request.data.get('name')
@@ -135,20 +208,18 @@ class RoleListView(APIView):
         if Group.objects.filter(name=name).exists():
             return Response({'error': 'A role with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            perms = Permission.objects.filter(codename__in=permission_codenames)
-            if len(perms) != len(permission_codenames):
-                return Response({'error': 'One or more permissions are invalid'}, status=status.HTTP_400_BAD_REQUEST)
-        except Permission.DoesNotExist:
-            return Response({'error': 'Invalid permission'}, status=status.HTTP_400_BAD_REQUEST)
+        perms = permission_ids(permission_codenames)
+        if len(perms) != len(set(permission_codenames)):
+            return Response({'error': 'One or more permissions are invalid'}, status=status.HTTP_400_BAD_REQUEST)
 
-        group = Group.objects.create(name=name)
-        group.permissions.set(perms)
+        with transaction.atomic(using=router.db_for_write(Group)):
+            group = Group.objects.create(name=name)
+            update_roles(permissions={group.id: chain.from_iterable(perms.values())})
 
         return Response({
             'id': group.id,
             'name': group.name,
-            'permissions': [p.codename for p in group.permissions.all()]
+            'permissions': sorted(perms),
         }, status=status.HTTP_201_CREATED)
 
 
@@ -164,38 +235,39 @@ class RoleDetailView(APIView):
         return get_object_or_404(Group, id=role_id)
 
     def get(self, request, role_id):
-        group = self.get_object(role_id)
-        return Response({
-            'id': group.id,
-            'name': group.name,
-            'permissions': [p.codename for p in group.permissions.all()],
-            'user_count': group.user_set.count(),
-        })
+        key = roles_cache_key('detail', role_id)
+        data = cache.get(key)
+        if data is None:
+            data = role_payload(with_user_counts([get_object_or_404(annotated_roles(), id=role_id)])[0])
+            cache.set(key, data, roles_cache_ttl())
+        return Response(data)
 
     def put(self, request, role_id):
         group = self.get_object(role_id)
         name = request.data.get('name')
         permission_codenames = request.data.get('permissions', [])
 
+        names = {}
         if name and name != group.name:
             if Group.objects.exclude(id=role_id).filter(name=name).exists():
                 return Response({'error': 'A role with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
-            group.name = name
+            names[group.id] = group.name = name
 
-        try:
-            perms = Permission.objects.filter(codename__in=permission_codenames)
-            if len(perms) != len(permission_codenames):
-                return Response({'error': 'One or more permissions are invalid'}, status=status.HTTP_400_BAD_REQUEST)
-        except Permission.DoesNotExist:
-            return Response({'error': 'Invalid permission'}, status=status.HTTP_400_BAD_REQUEST)
+        perms = permission_ids(permission_codenames)
+        if len(perms) != len(set(permission_codenames)):
+            return Response({'error': 'One or more permissions are invalid'}, status=status.HTTP_400_BAD_REQUEST)
 
-        group.permissions.set(perms)
-        group.save()
+        # Only the permission links that changed are written
+        try:
+            update_roles(names, {group.id: chain.from_iterable(perms.values())})
+        except IntegrityError:
+            # Renamed concurrently to the same name
+            return Response({'error': 'A role with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             'id': group.id,
             'name': group.name,
-            'permissions': [p.codename for p in group.permissions.all()]
+            'permissions': sorted(perms),
         })
 
     def delete(self, request, role_id):
@@ -208,4 +280,107 @@ class RoleDetailView(APIView):
             )
 
         group.delete()
-        return Response({'message': 'Role deleted successfully'}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({'message': 'Role deleted successfully'}, status=status.HTTP_200_OK)
+
+
+class RoleBatchUpdateView(APIView):
+    """
+    POST: Apply many role edits in one transaction.
+    Body: {"roles": [{"id": 1, "name": "Auditor", "permissions": ["view_reports"]}, ...]}
+    "name" and "permissions" are optional; an omitted one is left unchanged.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request):
+        edits = request.data.get('roles')
+        if not isinstance(edits, list) or not all(
+            isinstance(e, dict)
+            and isinstance(e.get('id'), int)
+            and not isinstance(e['id'], bool)
+            and isinstance(e.get('name', ''), str)
+            and isinstance(e.get('permissions', []), list)
+            for e in edits
+        ):
+            return Response(
+                {'error': 'roles must be a list of {"id", "name", "permissions"} objects'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        role_ids = [e['id'] for e in edits]
+        if len(set(role_ids)) != len(role_ids):
+            return Response({'error': 'Each role may appear only once'}, status=status.HTTP_400_BAD_REQUEST)
+
+        current_names = dict(Group.objects.filter(id__in=role_ids).values_list('id', 'name'))
+        unknown = [role_id for role_id in role_ids if role_id not in current_names]
+        if unknown:
+            return Response({'error': 'Unknown roles', 'ids': unknown}, status=status.HTTP_400_BAD_REQUEST)
+
+        names = {e['id']: e['name'] for e in edits if e.get('name') and e['name'] != current_names[e['id']]}
+        # Names held by roles being renamed are free, so swaps pass
+        taken = names and Group.objects.filter(name__in=names.values()).exclude(id__in=names).exists()
+        if len(set(names.values())) != len(names) or taken:
+            return Response({'error': 'A role with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
+
+        requested = {e['id']: set(e['permissions']) for e in edits if 'permissions' in e}
+        perms = permission_ids(chain.from_iterable(requested.values()))
+        invalid = sorted(set().union(*requested.values()) - perms.keys())
+        if invalid:
+            return Response({'error': 'One or more permissions are invalid', 'permissions': invalid}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            added, removed = update_roles(names, {
+                role_id: [pk for codename in codenames for pk in perms[codename]]
+                for role_id, codenames in requested.items()
+            })
+        except IntegrityError:
+            # A name taken concurrently; the unique constraint is the final check
+            return Response({'error': 'A role with this name already exists'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': len(edits), 'permissions_added': added, 'permissions_removed': removed})
+
+
+class BulkRoleAssignView(APIView):
+    """
+    POST: Assign one role to many users at once.
+    Body: {"role": "accountant", "user_ids": [1, 2, 3]}
+    """
+    permission_classes = [IsAuthenticated, CanManageUsers]
+
+    def post(self, request):
+        role = request.data.get('role')
+        user_ids = request.data.get('user_ids')
+
+        if role not in [r.value for r in RoleChoices]:
+            return Response({'error': 'Invalid role'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(user_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in user_ids):
+            return Response({'error': 'user_ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = assign_role(user_ids, role)
+        return Response({'role': role, 'updated': updated})
+
+
+# ------------------------------
+# 🛒 Product Catalog
+# ------------------------------
+
+class ProductListView(APIView):
+    """
+    GET: List the tenant's products, newest first, by cursor (?cursor=, ?page_size=).
+    ?fields=name,price limits both the response and the columns fetched.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        fields = request.query_params.get('fields')
+        if fields is not None:
+            fields = [name for name in fields.split(',') if name]
+            unknown = sorted(set(fields) - set(ProductSerializer.Meta.fields))
+            if unknown:
+                return Response({'error': 'Unknown fields', 'fields': unknown}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the columns the selected fields read (wide ones like description
+        # and image stay unfetched), plus the pagination key
+        columns = ProductSerializer(fields=fields).model_field_names()
+        queryset = Product.objects.only('created_at', *columns)
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(ProductSerializer(page, many=True, fields=fields).data)
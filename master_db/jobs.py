@@ -0,0 +1,190 @@
+# master_db/jobs.py
+"""
+Database-backed queue of tenant provisioning jobs.
+
+TenantRegisterAPIView only enqueues a ProvisioningJob; `manage.py
+run_provisioning_jobs` claims queued jobs with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of runner processes can share the queue.
+
+A claimed job is leased to its runner, which refreshes `heartbeat_at` every
+PROVISIONING_JOB_HEARTBEAT_INTERVAL seconds while provisioning. Only a job
+whose heartbeat is older than PROVISIONING_JOB_STALE_AFTER seconds (its
+runner died) is claimed again, up to PROVISIONING_JOB_MAX_ATTEMPTS. Writes
+are fenced on the attempt number, so a runner that lost its lease cannot
+overwrite the outcome of the attempt that took over. A retry first checks
+whether an earlier attempt already committed the tenant.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django_tenants.utils import schema_exists
+
+from .models import Client, Domain, ProvisioningJob
+from core.tenant_registry import dedicated_databases_enabled, tenant_databases
+
+from .provisioning import drop_schema
+from .services import create_tenant
+from .sharding import get_shard_aliases
+from .utils import drop_tenant_database, tenant_database_name
+
+logger = logging.getLogger('tenants.provisioning')
+
+Status = ProvisioningJob.Status
+
+
+def stale_after():
+    return getattr(settings, "PROVISIONING_JOB_STALE_AFTER", 600)
+
+
+def heartbeat_interval():
+    return getattr(settings, "PROVISIONING_JOB_HEARTBEAT_INTERVAL", 30)
+
+
+def _lease_expired():
+    """Running jobs whose runner stopped heartbeating."""
+    expiry = timezone.now() - timedelta(seconds=stale_after())
+    return Q(status=Status.RUNNING) & (
+        Q(heartbeat_at__lt=expiry) | Q(heartbeat_at__isnull=True, started_at__lt=expiry)
+    )
+
+
+def max_attempts():
+    return getattr(settings, "PROVISIONING_JOB_MAX_ATTEMPTS", 3)
+
+
+def enqueue_tenant(name, domain, contact_email=None, plan='free'):
+    return ProvisioningJob.objects.create(
+        name=name, domain=domain, contact_email=contact_email, plan=plan
+    )
+
+
+def claim_job():
+    """Lease the oldest runnable job to this runner and return it, or None."""
+    with transaction.atomic():
+        job = (
+            ProvisioningJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Status.QUEUED) | _lease_expired(), attempts__lt=max_attempts())
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Status.RUNNING
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.error = ""
+        job.step_timings = {"queued": round((job.started_at - job.created_at).total_seconds(), 3)}
+        job.save(update_fields=["status", "attempts", "started_at", "heartbeat_at", "error", "step_timings"])
+    return job
+
+
+def _leased(job):
+    """The job's row, if this attempt still holds the lease."""
+    return ProvisioningJob.objects.filter(id=job.id, status=Status.RUNNING, attempts=job.attempts)
+
+
+@contextmanager
+def _heartbeat(job):
+    """Refresh the job's lease from a background thread while the block runs."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(heartbeat_interval()):
+                if not _leased(job).update(heartbeat_at=timezone.now()):
+                    logger.warning("Provisioning job %s lost its lease", job.id)
+                    return
+        finally:
+            connections.close_all()  # this thread's connections
+
+    thread = threading.Thread(target=beat, name=f"provisioning-job-{job.id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def provisioned_tenant(job):
+    """The job's tenant if an attempt already committed it (its domain and schema exist), else None."""
+    domain = Domain.objects.select_related("tenant").filter(domain=job.domain).first()
+    if domain is not None and schema_exists(domain.tenant.schema_name, database=domain.tenant.shard):
+        return domain.tenant
+    return None
+
+
+def _drop_orphan_schema(job):
+    # A failed attempt rolls its Client row back but not the schema (or database) it created
+    schema = job.domain.split('.')[0]
+    if Client.objects.filter(schema_name=schema).exists():
+        return
+    for alias in get_shard_aliases():
+        if schema_exists(schema, database=alias):
+            logger.info("Dropping schema %s on %s left by an earlier attempt of job %s", schema, alias, job.id)
+            drop_schema(alias, schema)
+    if dedicated_databases_enabled():
+        drop_tenant_database(tenant_database_name(schema))
+
+
+def run_job(job):
+    """Provision the job's tenant and record the outcome and per-step timings."""
+    start = time.monotonic()
+    with _heartbeat(job):
+        try:
+            job.tenant = provisioned_tenant(job) if job.attempts > 1 else None
+            if job.tenant is not None:
+                job.step_timings["recovered"] = 0.0
+            else:
+                if job.attempts > 1:
+                    _drop_orphan_schema(job)
+                job.tenant = create_tenant(
+                    name=job.name,
+                    domain=job.domain,
+                    contact_email=job.contact_email,
+                    plan=job.plan,
+                    timings=job.step_timings,
+                )
+            job.status = Status.SUCCEEDED
+        except Exception as e:
+            logger.exception("Provisioning job %s failed", job.id)
+            job.status = Status.FAILED
+            job.error = str(e)
+        finally:
+            # Runners live outside the request cycle: drop this job's tenant database holds
+            tenant_databases.release_thread()
+    job.step_timings["total"] = round(time.monotonic() - start, 3)
+    job.finished_at = timezone.now()
+    recorded = _leased(job).update(
+        status=job.status,
+        tenant=job.tenant,
+        error=job.error,
+        step_timings=job.step_timings,
+        finished_at=job.finished_at,
+    )
+    if not recorded:
+        # Another attempt took over; its outcome stands
+        logger.warning("Provisioning job %s attempt %s finished after losing its lease", job.id, job.attempts)
+    return job
+
+
+def fail_exhausted_jobs():
+    """
+    Settle jobs whose runners died on every attempt: succeeded if one of them
+    committed the tenant, failed otherwise. Returns the number failed.
+    """
+    failed = 0
+    for job in ProvisioningJob.objects.filter(_lease_expired(), attempts__gte=max_attempts()):
+        tenant = provisioned_tenant(job)
+        if tenant is not None:
+            _leased(job).update(status=Status.SUCCEEDED, tenant=tenant, finished_at=timezone.now())
+        else:
+            failed += _leased(job).update(status=Status.FAILED, error="Runner lost", finished_at=timezone.now())
+    return failed
@@ -0,0 +1,62 @@
+# master_db/management/commands/benchmark_provisioning.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from master_db.provisioning import (
+    claim_warm_schema,
+    clone_template,
+    migrate_schema,
+    refill_warm_schemas,
+)
+from master_db.sharding import get_shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Compare schema provisioning time: full migrate vs template clone vs warm claim"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=3, help="Schemas per method")
+        parser.add_argument("--shard", default=None, help="Shard alias (default: first shard)")
+
+    def handle(self, *args, **options):
+        alias = options["shard"] or get_shard_aliases()[0]
+        count = options["count"]
+        methods = {
+            "migrate": self._create_by_migrating,
+            "template": lambda schema: clone_template(alias, schema),
+            "warm": lambda schema: claim_warm_schema(alias, schema),
+        }
+        self.alias = alias
+        for name, create in methods.items():
+            if name == "warm":
+                # Warm schemas are prepared ahead of time; that cost is not on the request path
+                refill_warm_schemas(alias, count)
+            timings = []
+            for _ in range(count):
+                schema = f"bench_{uuid.uuid4().hex[:12]}"
+                start = time.monotonic()
+                try:
+                    if create(schema) is False:
+                        raise CommandError(
+                            f"'{name}' unavailable on {alias}; run refresh_tenant_template first"
+                        )
+                    timings.append(time.monotonic() - start)
+                finally:
+                    self._drop(schema)
+            self.stdout.write(
+                f"{name:>8}: avg {sum(timings) / len(timings):.3f}s  "
+                f"min {min(timings):.3f}s  max {max(timings):.3f}s  (n={count})"
+            )
+
+    def _create_by_migrating(self, schema):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA "{schema}"')
+        migrate_schema(self.alias, schema, verbosity=0)
+
+    def _drop(self, schema):
+        connections[self.alias].set_schema_to_public()
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
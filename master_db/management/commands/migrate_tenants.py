@@ -0,0 +1,146 @@
+# master_db/management/commands/migrate_tenants.py
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name
+
+from master_db.models import Client, TenantMigrationProgress, TenantMigrationRun
+from master_db.provisioning import is_schema_current, migrate_schema, migration_target, set_migration_version
+
+Status = TenantMigrationProgress.Status
+
+
+def _migrate_one(alias, schema, verbosity):
+    """Runs in a worker process. Returns (status, seconds, error)."""
+    start = time.monotonic()
+    try:
+        if is_schema_current(alias, schema):
+            return Status.SKIPPED, time.monotonic() - start, ""
+        migrate_schema(alias, schema, verbosity)
+    except Exception as exc:
+        return Status.FAILED, time.monotonic() - start, "".join(traceback.format_exception_only(exc)).strip()
+    finally:
+        connections[alias].set_schema_to_public()
+    return Status.DONE, time.monotonic() - start, ""
+
+
+class Command(BaseCommand):
+    help = (
+        "Migrate all tenant schemas with a pool of worker processes. Progress is recorded "
+        "per schema, so rerunning after a crash only migrates what is left."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Schemas migrated in parallel")
+        parser.add_argument("--shard", default=None, help="Only migrate tenants on this shard")
+        parser.add_argument(
+            "--schema",
+            action="append",
+            dest="schemas",
+            help="Only migrate this schema (repeatable), e.g. the hot tenants when TENANT_LAZY_MIGRATIONS is on",
+        )
+        parser.add_argument("--restart", action="store_true", help="Start a new run instead of resuming")
+
+    def handle(self, *args, **options):
+        verbosity = max(options["verbosity"] - 1, 0)
+        run, resumed = self._get_run(options["restart"])
+        self._add_schemas(run, options["shard"])
+
+        scope = run.schemas.all()
+        if options["shard"]:
+            scope = scope.filter(shard=options["shard"])
+        if options["schemas"]:
+            scope = scope.filter(schema_name__in=options["schemas"])
+        todo = list(scope.exclude(status__in=[Status.DONE, Status.SKIPPED]).order_by("id"))
+        verb = "Resuming" if resumed else "Starting"
+        self.stdout.write(f"🚀 {verb} run {run.id}: {len(todo)} schema(s), {options['workers']} worker(s)")
+
+        start = time.monotonic()
+        if todo:
+            self._migrate(todo, options["workers"], verbosity, run.target)
+        self._report(run, scope, time.monotonic() - start)
+
+    def _get_run(self, restart):
+        target = migration_target()
+        run = None
+        if not restart:
+            run = (
+                TenantMigrationRun.objects.filter(finished_at__isnull=True, target=target)
+                .order_by("-id")
+                .first()
+            )
+        if run is not None:
+            return run, True
+        return TenantMigrationRun.objects.create(target=target), False
+
+    def _add_schemas(self, run, shard):
+        # Tenants created since the run started are added to it
+        clients = Client.objects.exclude(schema_name=get_public_schema_name())
+        if shard:
+            clients = clients.filter(shard=shard)
+        TenantMigrationProgress.objects.bulk_create(
+            [
+                TenantMigrationProgress(run=run, schema_name=schema_name, shard=client_shard)
+                for schema_name, client_shard in clients.values_list("schema_name", "shard")
+            ],
+            ignore_conflicts=True,
+        )
+
+    def _migrate(self, todo, workers, verbosity, target):
+        # Forked workers must not inherit open connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+        with executor:
+            # With fork, all workers are started on the first submit, before the
+            # connection below is opened
+            futures = {
+                executor.submit(_migrate_one, progress.shard, progress.schema_name, verbosity): progress
+                for progress in todo
+            }
+            TenantMigrationProgress.objects.filter(id__in=[p.id for p in todo]).update(
+                status=Status.RUNNING, error="", updated_at=timezone.now()
+            )
+            for done, future in enumerate(as_completed(futures), 1):
+                progress = futures[future]
+                try:
+                    progress.status, progress.duration, progress.error = future.result()
+                except Exception as exc:  # worker died
+                    progress.status, progress.duration, progress.error = Status.FAILED, None, repr(exc)
+                progress.save(update_fields=["status", "duration", "error", "updated_at"])
+                if progress.status != Status.FAILED:
+                    set_migration_version(Client.objects.filter(schema_name=progress.schema_name), target)
+                self._print_progress(done, len(todo), progress)
+
+    def _print_progress(self, done, total, progress):
+        icon = {Status.DONE: "✅", Status.SKIPPED: "⏭️", Status.FAILED: "❌"}[progress.status]
+        duration = f"{progress.duration:.2f}s" if progress.duration is not None else "-"
+        line = f"[{done}/{total}] {icon} {progress.shard}/{progress.schema_name} {progress.status} ({duration})"
+        if progress.status == Status.FAILED:
+            self.stderr.write(f"{line}: {progress.error}")
+        else:
+            self.stdout.write(line)
+
+    def _report(self, run, scope, elapsed):
+        counts = {status: scope.filter(status=status).count() for status in Status.values}
+        self.stdout.write(
+            f"\n⏱️ {elapsed:.2f}s — done: {counts[Status.DONE]}, skipped: {counts[Status.SKIPPED]}, "
+            f"failed: {counts[Status.FAILED]}, left: {counts[Status.PENDING] + counts[Status.RUNNING]}"
+        )
+        slowest = scope.filter(status=Status.DONE).order_by("-duration")[:5]
+        for progress in slowest:
+            self.stdout.write(f"   {progress.schema_name}: {progress.duration:.2f}s")
+        if counts[Status.FAILED] or counts[Status.PENDING] or counts[Status.RUNNING]:
+            for progress in scope.filter(status=Status.FAILED):
+                self.stderr.write(f"   {progress.shard}/{progress.schema_name}: {progress.error}")
+            raise CommandError(f"Run {run.id} incomplete; rerun migrate_tenants to resume it")
+        if run.schemas.exclude(status__in=[Status.DONE, Status.SKIPPED]).exists():
+            self.stdout.write(self.style.SUCCESS(f"✅ Selected schemas of run {run.id} migrated"))
+        else:
+            run.finished_at = timezone.now()
+            run.save(update_fields=["finished_at"])
+            self.stdout.write(self.style.SUCCESS(f"✅ Run {run.id} complete"))
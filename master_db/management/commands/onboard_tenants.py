@@ -0,0 +1,202 @@
+# master_db/management/commands/onboard_tenants.py
+import csv
+import itertools
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, transaction
+from django_tenants.postgresql_backend.base import is_valid_schema_name
+from django_tenants.utils import schema_exists
+
+from master_db.models import Client, Domain
+from master_db.provisioning import create_tenant_schema, drop_schema
+from master_db.services import seed_tenant
+from master_db.sharding import choose_shards
+
+
+def _read_rows(path, fmt):
+    """Yield (line number, row dict) without loading the whole file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_num, json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_num, None
+
+
+def _provision(tenant_id, verbosity):
+    """Runs in a worker process. Returns (tenant id, method, seconds, error)."""
+    start = time.monotonic()
+    tenant = Client.objects.get(id=tenant_id)
+    existed = False
+    try:
+        method = create_tenant_schema(tenant, check_if_exists=True, verbosity=verbosity)
+        if method is None:
+            existed = True
+            raise CommandError(f'Schema "{tenant.schema_name}" already exists on {tenant.shard}')
+        seed_tenant(tenant)
+    except Exception as e:
+        # create_tenant_schema can fail after CREATE SCHEMA (e.g. in migrate): drop
+        # whatever this run left behind, never a schema that was there before
+        if not existed and schema_exists(tenant.schema_name, database=tenant.shard):
+            connections[tenant.shard].set_schema_to_public()
+            drop_schema(tenant.shard, tenant.schema_name)
+        return tenant_id, None, time.monotonic() - start, str(e)
+    return tenant_id, method, time.monotonic() - start, ""
+
+
+class Command(BaseCommand):
+    help = (
+        "Onboard tenants from a CSV or NDJSON file (name, domain, contact_email, plan): "
+        "rows are inserted in batches and schemas provisioned in parallel"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV with a header row, or one JSON object per line")
+        parser.add_argument("--format", choices=["csv", "ndjson"], default=None, help="Default: from the extension")
+        parser.add_argument("--batch-size", type=int, default=200, help="Tenants inserted per batch")
+        parser.add_argument("--workers", type=int, default=4, help="Schemas provisioned in parallel")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or ("csv" if options["path"].endswith(".csv") else "ndjson")
+        self.verbosity = max(options["verbosity"] - 1, 0)
+        self.workers = options["workers"]
+        self.failures = []
+        self.succeeded = 0
+        self.seen = set()  # names, schemas and domains already used in this file
+
+        start = time.monotonic()
+        rows = _read_rows(options["path"], fmt)
+        processed = 0
+        while True:
+            batch = list(itertools.islice(rows, options["batch_size"]))
+            if not batch:
+                break
+            self._onboard_batch(batch)
+            processed += len(batch)
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f"📦 {processed} rows: {self.succeeded} onboarded, {len(self.failures)} failed "
+                f"({processed / elapsed:.1f} rows/s)"
+            )
+
+        for line_num, name, error in self.failures:
+            self.stderr.write(f"❌ line {line_num} ({name}): {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {self.succeeded} tenant(s) onboarded in {time.monotonic() - start:.2f}s, "
+            f"{len(self.failures)} failed"
+        ))
+
+    def _onboard_batch(self, batch):
+        clients, domains, lines = self._build(batch)
+        if not clients:
+            return
+        choose_shards(clients)
+        clients = self._insert(clients, domains, lines)
+
+        # Forked workers must not inherit open connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"))
+        failed_ids = []
+        with executor:
+            futures = {executor.submit(_provision, client.id, self.verbosity): client for client in clients}
+            for future in as_completed(futures):
+                client = futures[future]
+                try:
+                    tenant_id, method, seconds, error = future.result()
+                except Exception as e:  # worker died
+                    tenant_id, method, seconds, error = client.id, None, 0.0, repr(e)
+                if error:
+                    failed_ids.append(tenant_id)
+                    self.failures.append((lines[client.schema_name], client.name, error))
+                else:
+                    self.succeeded += 1
+                    if self.verbosity:
+                        self.stdout.write(f"   {client.schema_name} on {client.shard} via {method} ({seconds:.2f}s)")
+        # Domains cascade
+        Client.objects.filter(id__in=failed_ids).delete()
+
+    def _build(self, batch):
+        """Validate rows; return unsaved clients, their domains and source lines by schema."""
+        candidates = []
+        for line_num, row in batch:
+            if not isinstance(row, dict):
+                self.failures.append((line_num, "", "not a JSON object"))
+                continue
+            name = (row.get("name") or "").strip()
+            domain = (row.get("domain") or "").strip().lower()
+            schema_name = domain.split('.')[0]  # same rule as create_tenant
+            error = None
+            if not name or not domain:
+                error = "name and domain are required"
+            elif not is_valid_schema_name(schema_name):
+                error = f"invalid schema name '{schema_name}'"
+            elif self._keys(name, schema_name, domain) & self.seen:
+                error = "duplicate in file"
+            if error:
+                self.failures.append((line_num, name, error))
+                continue
+            self.seen |= self._keys(name, schema_name, domain)
+            candidates.append((line_num, row, name, domain, schema_name))
+
+        taken = {("name", n) for n in Client.objects.filter(
+            name__in=[c[2] for c in candidates]).values_list("name", flat=True)}
+        taken |= {("schema", s) for s in Client.objects.filter(
+            schema_name__in=[c[4] for c in candidates]).values_list("schema_name", flat=True)}
+        taken |= {("domain", d) for d in Domain.objects.filter(
+            domain__in=[c[3] for c in candidates]).values_list("domain", flat=True)}
+
+        clients, domains, lines = [], {}, {}
+        for line_num, row, name, domain, schema_name in candidates:
+            if taken & self._keys(name, schema_name, domain):
+                self.failures.append((line_num, name, "tenant or domain already exists"))
+                continue
+            clients.append(Client(
+                name=name,
+                schema_name=schema_name,
+                contact_email=row.get("contact_email") or None,
+                plan=row.get("plan") or 'free',
+            ))
+            domains[schema_name] = domain
+            lines[schema_name] = line_num
+        return clients, domains, lines
+
+    @staticmethod
+    def _keys(name, schema_name, domain):
+        return {("name", name), ("schema", schema_name), ("domain", domain)}
+
+    def _insert(self, clients, domains, lines):
+        """Bulk-insert the batch; on a conflict (e.g. a concurrent signup) fall back to one row at a time."""
+        try:
+            with transaction.atomic():
+                Client.objects.bulk_create(clients)
+                Domain.objects.bulk_create(
+                    [Domain(domain=domains[c.schema_name], tenant=c, is_primary=True) for c in clients]
+                )
+            return clients
+        except IntegrityError:
+            for client in clients:
+                client.pk = None
+                client._state.adding = True
+
+        inserted = []
+        for client in clients:
+            try:
+                with transaction.atomic():
+                    Client.objects.bulk_create([client])
+                    Domain.objects.create(domain=domains[client.schema_name], tenant=client, is_primary=True)
+            except IntegrityError as e:
+                self.failures.append((lines[client.schema_name], client.name, str(e).strip()))
+            else:
+                inserted.append(client)
+        return inserted
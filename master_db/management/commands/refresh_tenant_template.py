@@ -0,0 +1,28 @@
+# master_db/management/commands/refresh_tenant_template.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from master_db.provisioning import get_template_schema, refill_warm_schemas, refresh_template
+from master_db.sharding import get_shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Migrate each shard's template schema to head and refill its warm schema pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--warm",
+            type=int,
+            default=getattr(settings, "TENANT_WARM_SCHEMAS", 0),
+            help="Warm schemas to keep ready per shard",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+        for alias in get_shard_aliases():
+            self.stdout.write(f"🔁 Refreshing '{get_template_schema()}' on {alias}...")
+            refresh_template(alias, verbosity=verbosity)
+            created = refill_warm_schemas(alias, options["warm"])
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ {alias}: template current, {created} warm schema(s) created")
+            )
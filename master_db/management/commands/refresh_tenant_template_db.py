@@ -0,0 +1,16 @@
+# master_db/management/commands/refresh_tenant_template_db.py
+from django.core.management.base import BaseCommand
+
+from master_db.utils import get_template_database, is_template_database_current, refresh_template_database
+
+
+class Command(BaseCommand):
+    help = "Migrate the template database new tenant databases are copied from (run after each release)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"🔁 Refreshing template database '{get_template_database()}'...")
+        refresh_template_database(verbosity=options["verbosity"])
+        if is_template_database_current():
+            self.stdout.write(self.style.SUCCESS("✅ Template database current"))
+        else:
+            self.stderr.write("❌ Template database still missing migrations")
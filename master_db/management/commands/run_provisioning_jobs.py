@@ -0,0 +1,67 @@
+# master_db/management/commands/run_provisioning_jobs.py
+import logging
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from master_db.jobs import claim_job, fail_exhausted_jobs, run_job
+
+logger = logging.getLogger('tenants.provisioning')
+
+
+def _runner(poll_interval, once):
+    """Runs in a worker process: claim and run jobs one at a time."""
+    while True:
+        job = claim_job()
+        if job is None:
+            if once:
+                return
+            connections.close_all()  # don't hold idle connections between polls
+            time.sleep(poll_interval)
+            continue
+        job = run_job(job)
+        timings = ", ".join(f"{step} {seconds:.2f}s" for step, seconds in job.step_timings.items())
+        if job.status == job.Status.SUCCEEDED:
+            logger.info("Job %s %s: %s (%s)", job.id, job.domain, job.status, timings)
+        else:
+            logger.error("Job %s %s: %s (%s) — %s", job.id, job.domain, job.status, timings, job.error)
+
+
+class Command(BaseCommand):
+    help = "Run queued tenant provisioning jobs with a bounded number of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=getattr(settings, "PROVISIONING_JOB_CONCURRENCY", 2),
+            help="Jobs provisioned at the same time",
+        )
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls when idle")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    def handle(self, *args, **options):
+        failed = fail_exhausted_jobs()
+        if failed:
+            self.stderr.write(f"❌ {failed} job(s) failed after exhausting their attempts")
+        self.stdout.write(f"🚀 Running provisioning jobs with {options['concurrency']} worker(s)")
+
+        # Forked workers must not inherit open connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_runner, args=(options["poll_interval"], options["once"]), daemon=True)
+            for _ in range(options["concurrency"])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(self.style.SUCCESS("✅ Provisioning runner stopped"))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='db_host',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='db_name',
+            field=models.CharField(blank=True, max_length=63, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='db_password',
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='db_port',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='db_user',
+            field=models.CharField(blank=True, max_length=63, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0002_client_database_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='shard',
+            # Existing tenants all live on the original tenant cluster
+            field=models.CharField(blank=True, default='tenant_db', max_length=63),
+            preserve_default=False,
+        ),
+    ]
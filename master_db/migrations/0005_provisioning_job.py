@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0004_tenant_migration_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProvisioningJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('name', models.CharField(max_length=100)),
+                ('domain', models.CharField(max_length=253)),
+                ('contact_email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('plan', models.CharField(default='free', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('step_timings', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='master_db.client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='master_db_p_status_ec5a54_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master_db', '0005_provisioning_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='migration_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models, connections
 from django_tenants.models import TenantMixin, DomainMixin
 from django_tenants.migration_executors import get_executor
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from core.roles import RoleChoices, ROLE_TO_GROUP
+from core.roles import RoleChoices
 
 class Client(TenantMixin):
     name = models.CharField(max_length=100, unique=True)
@@ -11,18 +11,39 @@ class Client(TenantMixin):
     contact_email = models.EmailField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
+    # Database-per-tenant mode only; blank for schema-per-tenant tenants
+    db_name = models.CharField(max_length=63, blank=True, null=True)
+    db_user = models.CharField(max_length=63, blank=True, null=True)
+    db_password = models.CharField(max_length=128, blank=True, null=True)
+    db_host = models.CharField(max_length=255, blank=True, null=True)
+    db_port = models.PositiveIntegerField(blank=True, null=True)
+
+    # Tenant cluster alias (settings.TENANT_SHARDS) holding this tenant's schema
+    shard = models.CharField(max_length=63, blank=True)
+
+    # provisioning.migration_target() the schema was last migrated to
+    migration_version = models.CharField(max_length=64, blank=True, default="")
+
     auto_create_schema = True
     auto_drop_schema = False  # Never auto-drop in prod!
 
-    def create_schema(self, check_if_exists=False, verbosity=1):
-        """Override to create schema in tenant_db instead of default."""
-        connection = connections['tenant_db']
-        executor = get_executor()(connection, self)
-        executor.create_schema(check_if_exists, verbosity)
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.shard:
+            from .sharding import choose_shard
+            self.shard = choose_shard(self)
+        super().save(*args, **kwargs)
+
+    def create_schema(self, check_if_exists=False, sync_schema=True, verbosity=1):
+        """
+        Override to create schema on the tenant's shard instead of default,
+        from a warm schema or the template when possible.
+        """
+        from .provisioning import create_tenant_schema
+        create_tenant_schema(self, check_if_exists, sync_schema, verbosity)
 
     def delete_schema(self, check_if_exists=False, verbosity=1):
-        """Override to delete schema from tenant_db."""
-        connection = connections['tenant_db']
+        """Override to delete schema from the tenant's shard."""
+        connection = connections[self.shard]
         executor = get_executor()(connection, self)
         executor.delete_schema(check_if_exists, verbosity)
 
@@ -56,15 +77,84 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_role = instance.__dict__.get("role")
+        return instance
+
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        self._assign_role_group()
+        # Only sync groups when the role changed (not on e.g. every last_login update)
+        if adding or self.role != getattr(self, "_loaded_role", None):
+            self._assign_role_group()
+        self._loaded_role = self.role
 
     def _assign_role_group(self):
-        from django.contrib.auth.models import Group
-        group_name = ROLE_TO_GROUP.get(self.role)
-        if not group_name:
+        from core.role_groups import role_groups
+        group_id = role_groups.group_id(self.role)
+        if group_id is None:
             return
-        group, created = Group.objects.get_or_create(name=group_name)
-        self.groups.clear()
-        self.groups.add(group)
\ No newline at end of file
+        self.groups.set([group_id])
+
+class TenantMigrationRun(models.Model):
+    """One rollout of tenant migrations; `migrate_tenants` resumes it until every schema is done."""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    target = models.CharField(max_length=64)  # digest of the tenant migrations being applied
+
+    def __str__(self):
+        return f"Migration run {self.id} ({self.target[:8]})"
+
+
+class TenantMigrationProgress(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        SKIPPED = "skipped", "Skipped"  # already at target
+        FAILED = "failed", "Failed"
+
+    run = models.ForeignKey(TenantMigrationRun, on_delete=models.CASCADE, related_name="schemas")
+    schema_name = models.CharField(max_length=63)
+    shard = models.CharField(max_length=63)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    duration = models.FloatField(blank=True, null=True)  # seconds
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("run", "schema_name")]
+
+    def __str__(self):
+        return f"{self.schema_name}: {self.status}"
+
+
+class ProvisioningJob(models.Model):
+    """A queued tenant signup, run by `manage.py run_provisioning_jobs`."""
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    name = models.CharField(max_length=100)
+    domain = models.CharField(max_length=253)
+    contact_email = models.EmailField(blank=True, null=True)
+    plan = models.CharField(max_length=20, default='free')
+    tenant = models.ForeignKey(Client, on_delete=models.SET_NULL, blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    step_timings = models.JSONField(default=dict, blank=True)  # step -> seconds
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)  # lease, refreshed while running
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"Provisioning {self.domain}: {self.status}"
@@ -0,0 +1,257 @@
+# master_db/provisioning.py
+"""
+Fast tenant schema creation.
+
+When a tenant schema is created on its shard, in order of preference:
+1. claim a warm schema (pre-created and migrated, renamed on claim)
+2. clone the shard's template schema (settings.TENANT_TEMPLATE_SCHEMA)
+3. CREATE SCHEMA and run every tenant migration (the original path)
+
+Warm schemas and the template are only used while they are at the current
+migration head, so provisioning time no longer depends on how many
+migrations there are. `manage.py refresh_tenant_template` rebuilds both
+after a release.
+
+Client.migration_version records the migration_target() a schema was last
+brought to. With settings.TENANT_LAZY_MIGRATIONS, CustomTenantMiddleware
+calls ensure_schema_current() so a tenant left behind by a deploy is
+migrated on its first request, by the one request that wins a per-tenant
+advisory try-lock; requests arriving meanwhile get a 503 with Retry-After
+instead of queueing behind the migration.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django_tenants.clone import CLONE_SCHEMA_FUNCTION
+from django_tenants.postgresql_backend.base import _check_schema_name
+from django_tenants.utils import schema_exists
+
+from master_db.tenant_cache import tenant_cache
+
+logger = logging.getLogger('tenants.provisioning')
+
+WARM_SCHEMA_PREFIX = "warm_"
+LAZY_MIGRATION_LOCK = 0x74656E  # advisory lock namespace, keyed by hashtext(schema)
+
+
+def get_template_schema():
+    return getattr(settings, "TENANT_TEMPLATE_SCHEMA", "tenant_template")
+
+
+@lru_cache(maxsize=None)
+def expected_migrations():
+    """(app, name) of every tenant-app migration in the code."""
+    labels = {
+        app_config.label
+        for app_config in apps.get_app_configs()
+        if app_config.name in settings.TENANT_APPS
+    }
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return frozenset(key for key in loader.graph.nodes if key[0] in labels)
+
+
+@lru_cache(maxsize=None)
+def migration_target():
+    """Digest of expected_migrations(); changes whenever a tenant migration is added."""
+    names = "\n".join(f"{app}.{name}" for app, name in sorted(expected_migrations()))
+    return hashlib.sha256(names.encode()).hexdigest()
+
+
+def is_schema_current(alias, schema):
+    """True if `schema` on `alias` has every tenant migration applied."""
+    _check_schema_name(schema)
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f'"{schema}".django_migrations'])
+        if cursor.fetchone()[0] is None:
+            return False
+        cursor.execute(f'SELECT app, name FROM "{schema}".django_migrations')
+        applied = set(cursor.fetchall())
+    return expected_migrations() <= applied
+
+
+def migrate_schema(alias, schema, verbosity=1):
+    call_command(
+        "migrate_schemas",
+        tenant=True,
+        schema_name=schema,
+        database=alias,
+        interactive=False,
+        verbosity=verbosity,
+    )
+
+
+def set_migration_version(clients, target):
+    """
+    Record `target` on a queryset of clients. update() sends no save
+    signals, so their tenant cache entries are dropped here; other workers
+    recheck the schema itself when their entry disagrees with the code.
+    """
+    pks = list(clients.values_list("pk", flat=True))
+    clients.model.objects.filter(pk__in=pks).update(migration_version=target)
+    for pk in pks:
+        tenant_cache.invalidate_tenant(pk)
+
+
+def record_migration_version(tenant, target=None):
+    """
+    Record the version the tenant's schema was migrated to. A queryset
+    update(), not save(): TenantMixin.save() refuses to run while the
+    tenant connection is set to another tenant's schema.
+    """
+    target = target or migration_target()
+    set_migration_version(type(tenant).objects.filter(pk=tenant.pk), target)
+    tenant.migration_version = target
+
+
+class SchemaOutOfDate(Exception):
+    """The tenant's schema is behind the code and another request is migrating it."""
+
+
+def lazy_migrations_enabled():
+    return getattr(settings, "TENANT_LAZY_MIGRATIONS", False)
+
+
+def ensure_schema_current(tenant):
+    """
+    Migrate the tenant's schema if its recorded version is behind the code.
+    Only the caller that wins a per-tenant advisory try-lock (held on a
+    connection of its own, since migrate_schemas closes the shard's) does
+    the work; the others get SchemaOutOfDate at once.
+    Returns True if tenant.migration_version was updated.
+    """
+    target = migration_target()
+    if tenant.migration_version == target:
+        return False
+    alias, schema = tenant.shard, tenant.schema_name
+    lock_connection = connections.create_connection(alias)
+    try:
+        with lock_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", [LAZY_MIGRATION_LOCK, schema])
+            if not cursor.fetchone()[0]:
+                raise SchemaOutOfDate(f'Schema "{schema}" on {alias} is being migrated to {target[:8]}')
+        try:
+            # Another worker may have migrated it before we took the lock
+            if not is_schema_current(alias, schema):
+                start = time.monotonic()
+                migrate_schema(alias, schema, verbosity=0)
+                logger.info("Lazily migrated %s on %s in %.2fs", schema, alias, time.monotonic() - start)
+            record_migration_version(tenant, target)
+        finally:
+            with lock_connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", [LAZY_MIGRATION_LOCK, schema])
+    finally:
+        lock_connection.close()
+    return True
+
+
+def list_warm_schemas(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT nspname FROM pg_catalog.pg_namespace WHERE nspname LIKE %s ORDER BY nspname",
+            [WARM_SCHEMA_PREFIX.replace("_", r"\_") + "%"],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def claim_warm_schema(alias, schema):
+    """Rename a current warm schema on `alias` to `schema`. Returns True on success."""
+    for warm_schema in list_warm_schemas(alias):
+        if not is_schema_current(alias, warm_schema):
+            continue
+        try:
+            with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                cursor.execute(f'ALTER SCHEMA "{warm_schema}" RENAME TO "{schema}"')
+        except DatabaseError:
+            continue  # claimed by a concurrent provisioning
+        return True
+    return False
+
+
+def clone_schema(alias, source, schema):
+    """Copy `source` (tables, data, sequences) into a new schema on `alias`."""
+    connection = connections[alias]
+    db_user = connection.settings_dict.get("USER") or "postgres"
+    with connection.cursor() as cursor:
+        cursor.execute(CLONE_SCHEMA_FUNCTION.format(db_user=db_user))
+        cursor.execute(
+            "SELECT clone_schema(%(base_schema)s, %(new_schema)s, %(clone_mode)s)",
+            {"base_schema": source, "new_schema": schema, "clone_mode": "DATA"},
+        )
+
+
+def clone_template(alias, schema):
+    """Clone the shard's template into `schema` if it is current. Returns True on success."""
+    template = get_template_schema()
+    if not schema_exists(template, database=alias) or not is_schema_current(alias, template):
+        return False
+    clone_schema(alias, template, schema)
+    return True
+
+
+def create_tenant_schema(tenant, check_if_exists=False, sync_schema=True, verbosity=1):
+    """Create (and migrate) the tenant's schema on its shard. Returns the method used."""
+    alias = tenant.shard
+    schema = tenant.schema_name
+    _check_schema_name(schema)
+    if check_if_exists and schema_exists(schema, database=alias):
+        return None
+
+    start = time.monotonic()
+    connections[alias].set_schema_to_public()
+    if sync_schema and claim_warm_schema(alias, schema):
+        method = "warm"
+    elif sync_schema and clone_template(alias, schema):
+        method = "template"
+    else:
+        method = "migrate"
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA "{schema}"')
+        if sync_schema:
+            migrate_schema(alias, schema, verbosity)
+    connections[alias].set_schema_to_public()
+    if sync_schema:
+        record_migration_version(tenant)
+    logger.info(
+        "Created schema %s on %s via %s in %.2fs", schema, alias, method, time.monotonic() - start
+    )
+    return method
+
+
+def drop_schema(alias, schema):
+    """Drop the schema (and everything in it) from the shard if it exists."""
+    _check_schema_name(schema)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+
+
+def refresh_template(alias, verbosity=1):
+    """Create the shard's template schema if missing and migrate it to head."""
+    template = get_template_schema()
+    if not schema_exists(template, database=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA "{template}"')
+    migrate_schema(alias, template, verbosity)
+
+
+def refill_warm_schemas(alias, count):
+    """Drop stale warm schemas on `alias` and clone the template until `count` are ready."""
+    current = []
+    for warm_schema in list_warm_schemas(alias):
+        if is_schema_current(alias, warm_schema):
+            current.append(warm_schema)
+        else:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(f'DROP SCHEMA "{warm_schema}" CASCADE')
+    created = 0
+    for _ in range(count - len(current)):
+        clone_schema(alias, get_template_schema(), f"{WARM_SCHEMA_PREFIX}{uuid.uuid4().hex[:16]}")
+        created += 1
+    return created
@@ -0,0 +1,16 @@
+# master_db/serializers.py
+
+from rest_framework import serializers
+from .models import ProvisioningJob
+
+
+class ProvisioningJobSerializer(serializers.ModelSerializer):
+    schema_name = serializers.CharField(source="tenant.schema_name", default=None)
+
+    class Meta:
+        model = ProvisioningJob
+        fields = [
+            "id", "status", "name", "domain", "plan", "tenant", "schema_name",
+            "attempts", "step_timings", "error", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = fields
@@ -1,46 +1,92 @@
 # master_db/services.py
 
+import time
+from contextlib import contextmanager
+
 from django.db import transaction
-from django_tenants.utils import tenant_context
+from core.tenant_registry import dedicated_databases_enabled
 from .models import Client, Domain
+from .sharding import shard_context
+from .utils import drop_tenant_database, provision_tenant_database, tenant_database_name
 from tenant_db.models import Product, CompanySettings # Import tenant-specific models
 
-def create_tenant(name, domain, contact_email=None, plan='free'):
+
+@contextmanager
+def _timed(timings, step):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[step] = round(time.monotonic() - start, 3)
+
+
+def seed_tenant(tenant):
+    """Insert the initial data of a new tenant into its schema."""
+    with shard_context(tenant):
+        # Create default products
+        Product.objects.bulk_create([
+            Product(name="Default Product 1", price="9.99", stock=100),
+            Product(name="Default Product 2", price="19.99", stock=50),
+        ])
+
+        # Create company settings
+        CompanySettings.objects.create(
+            company_name=tenant.name,
+            currency="USD",
+            timezone="UTC",
+        )
+
+        # Create any other initial data (categories, permissions, etc.)
+
+
+def create_tenant(name, domain, contact_email=None, plan='free', timings=None, dedicated_database=None):
     """
     Create a new tenant with its schema and seed initial data.
+    If `timings` is a dict, the seconds spent in each step are recorded in it.
+    With `dedicated_database` (default: settings.TENANT_DEDICATED_DATABASES)
+    the tenant also gets its own database, copied from the template database
+    when it is current, and its data is seeded there.
     """
-    # Wrap in transaction so if anything fails, nothing is created
-    with transaction.atomic():
-        # 1. Create Client → triggers schema creation in tenant_db
-        tenant = Client.objects.create(
-            name=name,
-            schema_name=domain.split('.')[0],  # e.g., 'companya' from 'companya.localhost'
-            contact_email=contact_email,
-            plan=plan,
-        )
-
-        # 2. Create Domain
-        Domain.objects.create(
-            domain=domain,
-            tenant=tenant,
-            is_primary=True,
-        )
+    if dedicated_database is None:
+        dedicated_database = dedicated_databases_enabled()
+    schema_name = domain.split('.')[0]  # e.g., 'companya' from 'companya.localhost'
+    db_name = tenant_database_name(schema_name) if dedicated_database else None
+    database_started = False
+    try:
+        # Wrap in transaction so if anything fails, nothing is created
+        with transaction.atomic():
+            # 1. Create Client → triggers schema creation on its tenant shard
+            with _timed(timings, "schema"):
+                tenant = Client.objects.create(
+                    name=name,
+                    schema_name=schema_name,
+                    contact_email=contact_email,
+                    plan=plan,
+                    db_name=db_name,
+                )
 
-        # 3. Seed initial data into the new tenant's schema
-        with tenant_context(tenant):
-            # Create default products
-            Product.objects.bulk_create([
-                Product(name="Default Product 1", price="9.99", stock=100),
-                Product(name="Default Product 2", price="19.99", stock=50),
-            ])
+            # 2. Create Domain
+            with _timed(timings, "domain"):
+                Domain.objects.create(
+                    domain=domain,
+                    tenant=tenant,
+                    is_primary=True,
+                )
 
-            # Create company settings
-            CompanySettings.objects.create(
-                company_name=name,
-                currency="USD",
-                timezone="UTC",
-            )
+            # 3. Create the tenant's own database (database-per-tenant mode)
+            if db_name:
+                with _timed(timings, "database"):
+                    database_started = True
+                    provision_tenant_database(tenant)
 
-            # Create any other initial data (categories, permissions, etc.)
+            # 4. Seed initial data into the new tenant's schema (or database)
+            with _timed(timings, "seed"):
+                seed_tenant(tenant)
 
-        return tenant
\ No newline at end of file
+            return tenant
+    except Exception:
+        # The Client row is rolled back; the database is not transactional
+        if database_started:
+            drop_tenant_database(db_name)
+        raise
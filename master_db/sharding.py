@@ -0,0 +1,86 @@
+# master_db/sharding.py
+"""
+Placement of tenant schemas across several tenant clusters ("shards").
+
+Every alias in settings.TENANT_SHARDS is a database holding tenant schemas;
+Client.shard records which one a tenant lives on. New tenants are placed by
+the callable named in settings.TENANT_SHARD_PLACEMENT_POLICY, which gets the
+unsaved client and the list of shard aliases and returns one of them.
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from core.tenant_context import tenant_scope
+from sampleDjango.replicas import get_replicas
+
+
+def get_shard_aliases():
+    return getattr(settings, "TENANT_SHARDS", [settings.TENANT_DATABASE_ALIAS])
+
+
+def _tenant_counts(shards):
+    from .models import Client
+
+    counts = dict.fromkeys(shards, 0)
+    for row in Client.objects.filter(shard__in=shards).values("shard").annotate(n=Count("id")):
+        counts[row["shard"]] = row["n"]
+    return counts
+
+
+def least_loaded_shard(client, shards):
+    """Default policy: the shard holding the fewest tenants."""
+    counts = _tenant_counts(shards)
+    return min(shards, key=lambda alias: counts[alias])
+
+
+@lru_cache(maxsize=None)
+def get_placement_policy():
+    path = getattr(settings, "TENANT_SHARD_PLACEMENT_POLICY", "master_db.sharding.least_loaded_shard")
+    return import_string(path)
+
+
+def choose_shard(client):
+    shards = get_shard_aliases()
+    if len(shards) == 1:
+        return shards[0]
+    return get_placement_policy()(client, shards)
+
+
+def choose_shards(clients):
+    """
+    Set `shard` on several unsaved clients. With the default policy the
+    tenant counts are read once and updated as clients are placed.
+    """
+    shards = get_shard_aliases()
+    if len(shards) > 1 and get_placement_policy() is least_loaded_shard:
+        counts = _tenant_counts(shards)
+        for client in clients:
+            client.shard = min(shards, key=lambda alias: counts[alias])
+            counts[client.shard] += 1
+    else:
+        for client in clients:
+            client.shard = choose_shard(client)
+
+
+@contextmanager
+def shard_context(tenant):
+    """
+    Like django_tenants.utils.tenant_context, but on the tenant's shard (and
+    its replicas), and with the tenant as the current tenant so routers send
+    tenant apps there.
+    """
+    aliases = (tenant.shard, *get_replicas(tenant.shard))
+    previous = {alias: connections[alias].tenant for alias in aliases}
+    for alias in aliases:
+        connections[alias].set_tenant(tenant)
+    try:
+        with tenant_scope(tenant):
+            yield tenant
+    finally:
+        for alias, previous_tenant in previous.items():
+            connections[alias].set_tenant(previous_tenant)
@@ -0,0 +1,162 @@
+# master_db/tenant_cache.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Client, Domain
+
+
+class TenantCache:
+    """
+    Per-worker LRU+TTL cache of hostname -> tenant.
+
+    Saves the Domain/Client lookup on every request. Entries expire after
+    `ttl` seconds so other workers pick up changes even without a signal.
+
+    Also remembers hostnames that resolved to nothing (for `negative_ttl`
+    seconds) and keeps a precomputed set of hostnames of inactive tenants,
+    so both can be rejected without touching the database.
+    """
+
+    def __init__(self, max_size=1024, ttl=60, negative_ttl=10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # hostname -> (expires_at, tenant)
+        self._missing = OrderedDict()  # hostname -> expires_at
+        self._inactive_hosts = None
+        self._inactive_expires_at = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected_unknown = 0
+        self.rejected_inactive = 0
+
+    def get(self, hostname):
+        """Return a copy of the cached tenant, or None on miss/expiry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[hostname]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(hostname)
+            self.hits += 1
+        # The middleware mutates the tenant (domain_url) — never hand out the shared one
+        return copy.copy(entry[1])
+
+    def set(self, hostname, tenant):
+        with self._lock:
+            self._entries[hostname] = (time.monotonic() + self.ttl, tenant)
+            self._entries.move_to_end(hostname)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, hostname):
+        with self._lock:
+            self._entries.pop(hostname, None)
+            self._missing.pop(hostname, None)
+
+    def invalidate_tenant(self, tenant_id):
+        """Drop every hostname that resolves to the given tenant."""
+        with self._lock:
+            stale = [h for h, (_, t) in self._entries.items() if t.pk == tenant_id]
+            for hostname in stale:
+                del self._entries[hostname]
+
+    def set_missing(self, hostname):
+        """Remember that hostname has no Domain row."""
+        with self._lock:
+            self._missing[hostname] = time.monotonic() + self.negative_ttl
+            self._missing.move_to_end(hostname)
+            while len(self._missing) > self.max_size:
+                self._missing.popitem(last=False)
+
+    def set_inactive(self, hostname):
+        with self._lock:
+            if self._inactive_hosts is not None:
+                self._inactive_hosts = self._inactive_hosts | {hostname}
+
+    def reset_inactive(self):
+        """Force the inactive-host set to be rebuilt on next use."""
+        with self._lock:
+            self._inactive_hosts = None
+
+    def rejection(self, hostname):
+        """
+        Return "unknown" or "inactive" if hostname can be turned away without
+        a query, else None.
+        """
+        now = time.monotonic()
+        inactive_hosts = self._get_inactive_hosts(now)
+        with self._lock:
+            if hostname in inactive_hosts:
+                self.rejected_inactive += 1
+                return "inactive"
+            expires_at = self._missing.get(hostname)
+            if expires_at is None:
+                return None
+            if expires_at <= now:
+                del self._missing[hostname]
+                return None
+            self.rejected_unknown += 1
+            return "unknown"
+
+    def _get_inactive_hosts(self, now):
+        with self._lock:
+            if self._inactive_hosts is not None and self._inactive_expires_at > now:
+                return self._inactive_hosts
+        hosts = frozenset(
+            Domain.objects.filter(tenant__is_active=False).values_list("domain", flat=True)
+        )
+        with self._lock:
+            self._inactive_hosts = hosts
+            self._inactive_expires_at = now + self.ttl
+        return hosts
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._missing.clear()
+            self._inactive_hosts = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "missing": len(self._missing),
+                "inactive": len(self._inactive_hosts or ()),
+                "rejected_unknown": self.rejected_unknown,
+                "rejected_inactive": self.rejected_inactive,
+            }
+
+
+tenant_cache = TenantCache(
+    max_size=getattr(settings, "TENANT_CACHE_MAX_SIZE", 1024),
+    ttl=getattr(settings, "TENANT_CACHE_TTL", 60),
+    negative_ttl=getattr(settings, "TENANT_CACHE_NEGATIVE_TTL", 10),
+)
+
+
+@receiver([post_save, post_delete], sender=Client)
+def _invalidate_client(sender, instance, **kwargs):
+    tenant_cache.invalidate_tenant(instance.pk)
+    tenant_cache.reset_inactive()
+
+
+@receiver([post_save, post_delete], sender=Domain)
+def _invalidate_domain(sender, instance, **kwargs):
+    # The hostname may have been renamed, so drop the tenant's other entries too
+    tenant_cache.invalidate(instance.domain)
+    tenant_cache.invalidate_tenant(instance.tenant_id)
+    tenant_cache.reset_inactive()
@@ -0,0 +1,167 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from master_db.jobs import claim_job, run_job
+from master_db.models import ProvisioningJob
+from master_db.provisioning import SchemaOutOfDate, ensure_schema_current, set_migration_version
+from master_db.services import create_tenant
+from master_db.tenant_cache import tenant_cache
+
+Status = ProvisioningJob.Status
+
+
+class ProvisioningJobLeaseTests(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.job = ProvisioningJob.objects.create(name="Acme", domain="acme.localhost")
+
+    def expire_lease(self):
+        ProvisioningJob.objects.filter(id=self.job.id).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+    def test_claim_leases_the_job(self):
+        job = claim_job()
+        self.assertEqual(job.id, self.job.id)
+        self.assertEqual((job.status, job.attempts), (Status.RUNNING, 1))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNone(claim_job())
+
+    def test_running_job_with_live_heartbeat_is_not_reclaimed(self):
+        claim_job()
+        self.assertIsNone(claim_job())
+
+    def test_running_job_with_expired_lease_is_reclaimed(self):
+        claim_job()
+        self.expire_lease()
+        job = claim_job()
+        self.assertEqual((job.id, job.attempts), (self.job.id, 2))
+
+    def test_exhausted_job_is_not_reclaimed(self):
+        ProvisioningJob.objects.filter(id=self.job.id).update(
+            status=Status.RUNNING, attempts=3, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertIsNone(claim_job())
+
+    @mock.patch("master_db.jobs.create_tenant", side_effect=RuntimeError("boom"))
+    def test_attempt_that_lost_its_lease_does_not_record_its_outcome(self, create_tenant):
+        first = claim_job()
+        self.expire_lease()
+        second = claim_job()
+        run_job(first)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), (Status.RUNNING, second.attempts))
+
+    @mock.patch("master_db.jobs._drop_orphan_schema")
+    @mock.patch("master_db.jobs.provisioned_tenant", return_value=None)
+    @mock.patch("master_db.jobs.create_tenant", side_effect=RuntimeError("boom"))
+    def test_retry_checks_for_an_earlier_attempt_first(self, create_tenant, provisioned_tenant, drop_orphan):
+        run_job(claim_job())
+        provisioned_tenant.assert_not_called()
+        self.expire_lease()
+        ProvisioningJob.objects.filter(id=self.job.id).update(status=Status.RUNNING)
+        run_job(claim_job())
+        provisioned_tenant.assert_called_once()
+        drop_orphan.assert_called_once()
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.error), (Status.FAILED, "boom"))
+
+
+class LazyMigrationTests(SimpleTestCase):
+    def setUp(self):
+        self.tenant = SimpleNamespace(pk=1, shard="tenant_db", schema_name="acme", migration_version="old")
+        self.cursor = mock.MagicMock()
+        self.lock_connection = mock.MagicMock()
+        self.lock_connection.cursor.return_value.__enter__.return_value = self.cursor
+        self.patch("master_db.provisioning.connections.create_connection", return_value=self.lock_connection)
+        self.patch("master_db.provisioning.migration_target", return_value="new")
+        self.migrate = self.patch("master_db.provisioning.migrate_schema")
+        self.current = self.patch("master_db.provisioning.is_schema_current", return_value=False)
+        self.record = self.patch("master_db.provisioning.record_migration_version")
+
+    def patch(self, target, **kwargs):
+        patcher = mock.patch(target, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_the_lock_winner_migrates(self):
+        self.cursor.fetchone.return_value = (True,)
+        with self.assertLogs("tenants.provisioning", "INFO"):
+            self.assertIs(ensure_schema_current(self.tenant), True)
+        self.migrate.assert_called_once_with("tenant_db", "acme", verbosity=0)
+        self.record.assert_called_once_with(self.tenant, "new")
+        self.assertIn("pg_advisory_unlock", self.cursor.execute.call_args[0][0])
+        self.lock_connection.close.assert_called_once()
+
+    def test_a_schema_migrated_meanwhile_is_only_recorded(self):
+        self.cursor.fetchone.return_value = (True,)
+        self.current.return_value = True
+        self.assertIs(ensure_schema_current(self.tenant), True)
+        self.migrate.assert_not_called()
+        self.record.assert_called_once()
+
+    def test_losers_fail_fast(self):
+        self.cursor.fetchone.return_value = (False,)
+        with self.assertRaises(SchemaOutOfDate):
+            ensure_schema_current(self.tenant)
+        self.migrate.assert_not_called()
+        self.lock_connection.close.assert_called_once()
+
+    def test_current_tenants_take_no_lock(self):
+        self.tenant.migration_version = "new"
+        self.assertIs(ensure_schema_current(self.tenant), False)
+        self.lock_connection.cursor.assert_not_called()
+
+
+class MigrationVersionTests(SimpleTestCase):
+    def test_recording_a_version_drops_the_cached_tenant(self):
+        clients = mock.MagicMock()
+        clients.values_list.return_value = [1]
+        tenant_cache.set("acme.localhost", SimpleNamespace(pk=1))
+        set_migration_version(clients, "new")
+        clients.model.objects.filter.return_value.update.assert_called_once_with(migration_version="new")
+        self.assertIsNone(tenant_cache.get("acme.localhost"))
+
+
+class DedicatedDatabaseProvisioningTests(SimpleTestCase):
+    def setUp(self):
+        self.mocks = {}
+        for name in ("Client", "Domain", "seed_tenant", "provision_tenant_database", "drop_tenant_database", "transaction"):
+            patcher = mock.patch(f"master_db.services.{name}")
+            self.mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.mocks["Client"].objects.create.side_effect = lambda **fields: SimpleNamespace(**fields)
+
+    def test_schema_tenants_get_no_database(self):
+        tenant = create_tenant("Acme", "acme.localhost", dedicated_database=False)
+        self.assertIsNone(tenant.db_name)
+        self.mocks["provision_tenant_database"].assert_not_called()
+
+    def test_dedicated_tenants_get_a_database_from_the_template_path(self):
+        timings = {}
+        tenant = create_tenant("Acme", "acme.localhost", timings=timings, dedicated_database=True)
+        self.assertEqual(tenant.db_name, "tenant_acme")
+        self.mocks["provision_tenant_database"].assert_called_once_with(tenant)
+        self.mocks["seed_tenant"].assert_called_once_with(tenant)
+        self.assertIn("database", timings)
+
+    @override_settings(TENANT_DEDICATED_DATABASES=True)
+    def test_the_setting_is_the_default(self):
+        self.assertEqual(create_tenant("Acme", "acme.localhost").db_name, "tenant_acme")
+
+    def test_a_failed_tenant_drops_its_database(self):
+        self.mocks["seed_tenant"].side_effect = RuntimeError("seed failed")
+        with self.assertRaises(RuntimeError):
+            create_tenant("Acme", "acme.localhost", dedicated_database=True)
+        self.mocks["drop_tenant_database"].assert_called_once_with("tenant_acme")
+
+    def test_a_database_never_started_is_not_dropped(self):
+        self.mocks["Domain"].objects.create.side_effect = RuntimeError("duplicate domain")
+        with self.assertRaises(RuntimeError):
+            create_tenant("Acme", "acme.localhost", dedicated_database=True)
+        self.mocks["drop_tenant_database"].assert_not_called()
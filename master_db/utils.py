@@ -1,10 +1,32 @@
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
+
 import psycopg2
+from psycopg2 import errors, sql
 from django.conf import settings
 from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+
+from core.tenant_registry import tenant_databases
+
+logger = logging.getLogger('tenants.provisioning')
+
+TEMPLATE_DATABASE_LOCK = 0x74706C  # advisory lock serializing template database clones and refreshes
+
+
+def get_template_database():
+    return getattr(settings, "TENANT_TEMPLATE_DATABASE", "tenant_template_db")
+
+
+def tenant_database_name(schema_name):
+    """Name of the dedicated database created for a tenant (TENANT_DEDICATED_DATABASES)."""
+    return f"tenant_{schema_name}"
 
 
-def create_tenant_database(tenant):
-    """Create physical tenant database."""
+def _admin_connection():
+    """Autocommit connection to the maintenance DB, for CREATE DATABASE."""
     conn = psycopg2.connect(
         dbname="postgres",  # connect to default DB
         user=settings.DATABASES["default"]["USER"],
@@ -13,44 +35,165 @@ def create_tenant_database(tenant):
         port=settings.DATABASES["default"]["PORT"],
     )
     conn.autocommit = True
-    cur = conn.cursor()
-    cur.execute(f"CREATE DATABASE {tenant.db_name};")
-    cur.close()
-    conn.close()
+    return conn
 
 
-def add_tenant_to_settings(tenant):
-    """Add tenant DB dynamically to settings."""
-    """Add tenant DB dynamically to settings."""
-    default_db = settings.DATABASES["default"]
-    if tenant.db_name not in settings.DATABASES:
-        settings.DATABASES[tenant.db_name] = {
+@contextmanager
+def _template_database_lock():
+    """
+    Admin connection holding the template lock. CREATE DATABASE ... TEMPLATE
+    fails while anyone else is connected to the template, so clones and
+    refreshes (including their freshness checks) run one at a time.
+    """
+    conn = _admin_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", [TEMPLATE_DATABASE_LOCK])
+        yield conn
+    finally:
+        conn.close()  # releases the lock
+
+
+def template_database_alias():
+    """Register the template database as a connection alias (same server as default)."""
+    alias = get_template_database()
+    if alias not in connections.settings:
+        default_db = settings.DATABASES["default"]
+        connections.settings[alias] = {
+            **default_db,
             "ENGINE": "django.db.backends.postgresql",
-            "NAME": tenant.db_name,
-            "USER": tenant.db_user,
-            "PASSWORD": tenant.db_password,
-            "HOST": settings.DATABASES["default"]["HOST"],
-            "PORT": settings.DATABASES["default"]["PORT"],
-            "OPTIONS": {"sslmode": "require"},  # ensure SSL
-            "TIME_ZONE": default_db.get("TIME_ZONE", "UTC"),
-            "ATOMIC_REQUESTS": False,
-            "AUTOCOMMIT": default_db.get("AUTOCOMMIT", True),
-            "CONN_HEALTH_CHECKS": default_db.get(
-                "CONN_HEALTH_CHECKS", True
-            ),  # <--- new
-            "CONN_MAX_AGE": default_db.get("CONN_MAX_AGE", 0),  # <--- added
+            "NAME": alias,
+            "CONN_MAX_AGE": 0,
+            "TEST": {},
         }
+    return alias
+
+
+@lru_cache(maxsize=None)
+def expected_database_migrations():
+    """(app, name) of every migration `migrate tenant_db` applies, dependencies included."""
+    graph = MigrationLoader(None, ignore_no_migrations=True).graph
+    expected = set()
+    for leaf in graph.leaf_nodes("tenant_db"):
+        expected.update(graph.forwards_plan(leaf))
+    return frozenset(expected)
+
+
+def template_database_exists():
+    conn = _admin_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", [get_template_database()])
+            return cur.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def is_template_database_current():
+    """True if the template database exists and has every tenant_db migration applied."""
+    if not template_database_exists():
+        return False
+    alias = template_database_alias()
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT to_regclass('django_migrations')")
+            if cursor.fetchone()[0] is None:
+                return False
+            cursor.execute("SELECT app, name FROM django_migrations")
+            applied = set(cursor.fetchall())
+    finally:
+        # CREATE DATABASE ... TEMPLATE fails while anyone is connected to the template
+        connections[alias].close()
+    return expected_database_migrations() <= applied
+
+
+def refresh_template_database(verbosity=1):
+    """Create the template database if missing and migrate it to head."""
+    with _template_database_lock() as conn:
+        if not template_database_exists():
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(get_template_database())))
+        alias = template_database_alias()
+        try:
+            call_command("migrate", "tenant_db", database=alias, interactive=False, verbosity=verbosity)
+        finally:
+            connections[alias].close()
+
+
+def create_tenant_database(tenant, use_template=True):
+    """
+    Create physical tenant database. Copied from the template database when
+    it is current; returns True in that case, as the copy needs no migrating.
+    If the copy still fails, an empty database is created instead.
+    """
+    statement = sql.SQL("CREATE DATABASE {}").format(sql.Identifier(tenant.db_name))
+    if not use_template:
+        conn = _admin_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(statement)
+        finally:
+            conn.close()
+        return False
+
+    template = get_template_database()
+    with _template_database_lock() as conn, conn.cursor() as cur:
+        # Closes its connection to the template before the copy below
+        from_template = is_template_database_current()
+        if from_template:
+            try:
+                cur.execute(statement + sql.SQL(" TEMPLATE {}").format(sql.Identifier(template)))
+            except errors.ObjectInUse:
+                # Someone outside the lock (e.g. psql) is connected to the template
+                logger.warning("Template database %s in use; creating %s empty", template, tenant.db_name)
+                from_template = False
+        else:
+            logger.warning("Template database %s missing or stale; run refresh_tenant_template_db", template)
+        if not from_template:
+            cur.execute(statement)
+    return from_template
+
+
+def drop_tenant_database(db_name):
+    """Drop a tenant database (e.g. left by a failed provisioning), disconnecting its sessions."""
+    if tenant_databases.is_live(db_name):
+        connections[db_name].close()
+    conn = _admin_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(db_name)))
+    finally:
+        conn.close()
+
+
+def add_tenant_to_settings(tenant):
+    """
+    Register the tenant DB alias and return it.
+
+    Goes through the tenant registry instead of growing settings.DATABASES,
+    so cold tenants are closed and forgotten again.
+    """
+    return tenant_databases.register(tenant)
 
 
 def migrate_tenant(tenant):
     """Run migrations for tenant DB."""
-    call_command("migrate", "tenant_db", database=tenant.db_name)
+    with tenant_databases.pinned(tenant) as alias:
+        call_command("migrate", "tenant_db", database=alias)
 
 
 def create_tenant_superuser(tenant):
     """Create superuser for tenant DB."""
     from tenant_db.models import User
 
-    User.objects.using(tenant.db_name).create_superuser(
-        username="admin", email=f"admin@{tenant.db_name}.com", password="admin123"
-    )
+    with tenant_databases.pinned(tenant) as alias:
+        User.objects.using(alias).create_superuser(
+            username="admin", email=f"admin@{tenant.db_name}.com", password="admin123"
+        )
+
+
+def provision_tenant_database(tenant):
+    """Create, migrate (unless copied from the template) and seed the admin user of a tenant DB."""
+    if not create_tenant_database(tenant):
+        migrate_tenant(tenant)
+    create_tenant_superuser(tenant)
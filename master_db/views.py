@@ -4,9 +4,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAdminUser
-from django_tenants.utils import tenant_context
-from .models import Client, Domain
-from .services import create_tenant  # ← You should have this service
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from .jobs import enqueue_tenant
+from .models import ProvisioningJob
+from .serializers import ProvisioningJobSerializer
 
 class TenantRegisterAPIView(APIView):
     permission_classes = [IsAdminUser]  # Only admins can create tenants
@@ -23,22 +25,23 @@ class TenantRegisterAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            tenant = create_tenant(
-                name=name,
-                domain=domain,
-                contact_email=contact_email,
-                plan=plan
-            )
-            return Response({
-                "id": tenant.id,
-                "name": tenant.name,
-                "schema_name": tenant.schema_name,
-                "domain": domain,
-                "message": "Tenant created successfully"
-            }, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            return Response(
-                {"error": str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
\ No newline at end of file
+        job = enqueue_tenant(
+            name=name,
+            domain=domain,
+            contact_email=contact_email,
+            plan=plan
+        )
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse("core:provisioning-job", args=[job.id]),
+            "message": "Tenant provisioning queued"
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class ProvisioningJobStatusAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ProvisioningJob.objects.select_related("tenant"), pk=job_id)
+        return Response(ProvisioningJobSerializer(job).data)
@@ -1,13 +1,124 @@
+import logging
+import math
+import time
+
 from django.db import connections
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
 from django_tenants.middleware.main import TenantMainMiddleware
 
+from core.password_hashing import PasswordHashingBusy
+from core.tenant_context import set_current_tenant
+from master_db.provisioning import SchemaOutOfDate, ensure_schema_current, lazy_migrations_enabled
+from master_db.sharding import get_shard_aliases
+from master_db.tenant_cache import tenant_cache
+from sampleDjango.replicas import get_replicas, pin_until, pinned_until, sticky_seconds
+
+logger = logging.getLogger('tenants.db')
+
 class CustomTenantMiddleware(TenantMainMiddleware):
+    def get_tenant(self, domain_model, hostname):
+        # Unknown and inactive hosts are turned away through no_tenant_found()
+        reason = tenant_cache.rejection(hostname)
+        if reason is not None:
+            raise domain_model.DoesNotExist(f'{reason} tenant host "{hostname}"')
+
+        tenant = tenant_cache.get(hostname)
+        if tenant is None:
+            try:
+                tenant = super().get_tenant(domain_model, hostname)
+            except domain_model.DoesNotExist:
+                tenant_cache.set_missing(hostname)
+                raise
+            if not tenant.is_active:
+                tenant_cache.set_inactive(hostname)
+                raise domain_model.DoesNotExist(f'inactive tenant host "{hostname}"')
+            tenant_cache.set(hostname, tenant)
+        if lazy_migrations_enabled() and ensure_schema_current(tenant):
+            tenant_cache.set(hostname, tenant)
+        return tenant
+
     def process_request(self, request):
-        super().process_request(request)
+        request._search_path_skips_at_start = self._search_path_switches_avoided()
+        set_current_tenant(None)
+        try:
+            super().process_request(request)
+        except SchemaOutOfDate as e:
+            # Another request holds the tenant's migration lock; don't queue behind it
+            logger.warning("%s", e)
+            response = HttpResponse("Tenant is being upgraded, retry shortly", status=503)
+            response['Retry-After'] = '30'
+            return response
         tenant = getattr(request, 'tenant', None)
-        if tenant is None:
-            connections['default'].schema_name = 'public'
-            connections['tenant_db'].schema_name = 'public'
-        else:
-            connections['tenant_db'].schema_name = tenant.schema_name
-            connections['default'].schema_name = 'public'
\ No newline at end of file
+        set_current_tenant(tenant)
+        for alias in ('default', *get_replicas('default')):
+            connections[alias].schema_name = 'public'
+        for shard in get_shard_aliases():
+            for alias in (shard, *get_replicas(shard)):
+                connections[alias].schema_name = 'public'
+        if tenant is not None:
+            for alias in (tenant.shard, *get_replicas(tenant.shard)):
+                connections[alias].schema_name = tenant.schema_name
+
+    def process_response(self, request, response):
+        set_current_tenant(None)
+        start = getattr(request, '_search_path_skips_at_start', None)
+        if start is not None:
+            request.search_path_switches_avoided = self._search_path_switches_avoided() - start
+            logger.debug(
+                "search_path switches avoided: %d", request.search_path_switches_avoided
+            )
+        return response
+
+    @staticmethod
+    def _search_path_switches_avoided():
+        return sum(
+            getattr(connections[alias], 'search_path_switches_avoided', 0)
+            for alias in ('default', *get_shard_aliases())
+        )
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes across requests: after a request that wrote, the client
+    gets a short-lived cookie pinning its next requests' reads to the primary.
+    Must come before any middleware that queries the database.
+    """
+    cookie_name = 'replica_pin'
+
+    def process_request(self, request):
+        try:
+            until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            until = 0.0
+        # Never honour a pin longer than we would have set ourselves
+        request._replica_pin_at_start = min(until, time.time() + sticky_seconds())
+        pin_until(request._replica_pin_at_start)
+
+    def process_response(self, request, response):
+        until = pinned_until()
+        if until > getattr(request, '_replica_pin_at_start', until):
+            response.set_cookie(
+                self.cookie_name,
+                str(until),
+                max_age=math.ceil(until - time.time()),
+                httponly=True,
+                samesite='Lax',
+            )
+        pin_until(0.0)
+        return response
+
+
+class PasswordHashingBusyMiddleware(MiddlewareMixin):
+    """
+    A plain 429 for PasswordHashingBusy raised outside DRF (admin login,
+    session auth views); DRF views already turn it into their own 429.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PasswordHashingBusy):
+            return None
+        response = HttpResponse(exception.detail, status=429, content_type='text/plain')
+        if exception.wait is not None:
+            response['Retry-After'] = str(math.ceil(exception.wait))
+        return response
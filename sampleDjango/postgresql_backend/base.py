@@ -0,0 +1,36 @@
+# sampleDjango/postgresql_backend/base.py
+from django_tenants.postgresql_backend.base import DatabaseWrapper as TenantDatabaseWrapper
+
+
+class DatabaseWrapper(TenantDatabaseWrapper):
+    """
+    django-tenants backend that remembers the search_path actually active on
+    the open connection and only issues `SET search_path` when it changes.
+
+    With CONN_MAX_AGE > 0, consecutive requests for the same tenant on one
+    connection then skip the round-trip entirely. close()/rollback() in the
+    parent already forget the active path, so a reconnect or an aborted
+    transaction still re-issues the SET.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.search_path_switches_avoided = 0
+        super().__init__(*args, **kwargs)
+
+    def set_tenant(self, tenant, include_public=True):
+        # The parent forgets the active search_path here even though nothing
+        # was sent to the server; keep it so _handle_search_path can compare.
+        active = self.search_path_set_schemas
+        super().set_tenant(tenant, include_public)
+        self.search_path_set_schemas = active
+
+    def _handle_search_path(self, cursor=None):
+        if (
+            not self._setting_search_path
+            and self.schema_name
+            and self.search_path_set_schemas is not None
+            and self.search_path_set_schemas == self._get_cursor_search_paths()
+        ):
+            self.search_path_switches_avoided += 1
+            return
+        super()._handle_search_path(cursor)
@@ -0,0 +1,131 @@
+# sampleDjango/replicas.py
+"""
+Read-replica selection for the master DB and the tenant shards.
+
+settings.DATABASE_REPLICAS maps a primary alias to its replica aliases.
+Reads go to a healthy replica unless the current context wrote recently
+(read-your-writes): a write pins reads to the primary for
+REPLICA_STICKY_SECONDS, within the request and, through a cookie set by
+ReplicaPinningMiddleware, for the client's next requests.
+
+Replicas whose replication lag exceeds REPLICA_MAX_LAG seconds (or that
+can't be reached) are left out until a later check, at most every
+REPLICA_CHECK_INTERVAL seconds per worker.
+"""
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('tenants.db')
+
+_pinned_until = ContextVar("replica_pinned_until", default=0.0)
+
+LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def get_replicas(primary):
+    return getattr(settings, "DATABASE_REPLICAS", {}).get(primary, [])
+
+
+def get_primary(alias):
+    """The primary `alias` replicates, or `alias` itself."""
+    for primary, replicas in getattr(settings, "DATABASE_REPLICAS", {}).items():
+        if alias in replicas:
+            return primary
+    return alias
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+
+def mark_write():
+    """Pin reads in the current context to the primary for a while."""
+    _pinned_until.set(time.time() + sticky_seconds())
+
+
+def pin_until(timestamp):
+    _pinned_until.set(timestamp)
+
+
+def pinned_until():
+    return _pinned_until.get()
+
+
+def is_pinned():
+    return _pinned_until.get() > time.time()
+
+
+class ReplicaMonitor:
+    """Per-worker cache of which replicas are within the lag threshold."""
+
+    def __init__(self, max_lag=5.0, check_interval=10.0):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._status = {}  # alias -> (next_check_at, healthy, lag)
+        self._round_robin = {}  # primary -> itertools.cycle
+
+    def healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            next_check_at, healthy, _ = self._status.get(alias, (0, True, None))
+            if next_check_at > now:
+                return healthy
+            # Claim the check so concurrent requests keep using the old answer
+            self._status[alias] = (now + self.check_interval, healthy, None)
+        lag = self._measure_lag(alias)
+        healthy = lag is not None and lag <= self.max_lag
+        if not healthy:
+            logger.warning("Replica %s dropped from reads (lag: %s)", alias, lag)
+        with self._lock:
+            self._status[alias] = (now + self.check_interval, healthy, lag)
+        return healthy
+
+    def choose(self, primary):
+        """A healthy replica of `primary`, or `primary` itself."""
+        replicas = get_replicas(primary)
+        if not replicas:
+            return primary
+        with self._lock:
+            cycle = self._round_robin.get(primary)
+            if cycle is None:
+                cycle = self._round_robin[primary] = itertools.cycle(replicas)
+        for _ in replicas:
+            alias = next(cycle)
+            if self.healthy(alias):
+                return alias
+        return primary
+
+    def stats(self):
+        with self._lock:
+            return {
+                alias: {"healthy": healthy, "lag": lag}
+                for alias, (_, healthy, lag) in self._status.items()
+            }
+
+    @staticmethod
+    def _measure_lag(alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_QUERY)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.exception("Replica lag check failed for %s", alias)
+            return None
+
+
+replica_monitor = ReplicaMonitor(
+    max_lag=getattr(settings, "REPLICA_MAX_LAG", 5.0),
+    check_interval=getattr(settings, "REPLICA_CHECK_INTERVAL", 10.0),
+)
@@ -1,20 +1,71 @@
 from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
 from django_tenants.routers import TenantSyncRouter
+from django_tenants.utils import get_public_schema_name
+
+from core.tenant_context import get_current_tenant_db_alias
+from core.tenant_registry import tenant_databases
+from master_db.sharding import get_shard_aliases
+from master_db.utils import get_template_database
+from sampleDjango.replicas import get_primary, is_pinned, mark_write, replica_monitor
+
+
+class ShardedTenantSyncRouter(TenantSyncRouter):
+    """
+    The migration router (settings.TENANT_SYNC_ROUTER) for every database:
+
+    - "default" (master): SHARED_APPS, in the public schema only
+    - every alias in TENANT_SHARDS, alike: TENANT_APPS in tenant schemas;
+      in the public schema, the shared apps that also have tenant copies
+      (they are routed to a shard when no tenant is active)
+    - dedicated tenant databases and their template: every migration
+      `migrate tenant_db` plans
+    - anything else, e.g. read replicas: nothing
+    """
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == get_template_database() or tenant_databases.is_live(db):
+            return True
+        public = getattr(connections[db], "schema_name", None) == get_public_schema_name()
+        if db == DEFAULT_DB_ALIAS:
+            return public and self.app_in_list(app_label, settings.SHARED_APPS)
+        if db not in get_shard_aliases():
+            return False
+        if not self.app_in_list(app_label, settings.TENANT_APPS):
+            return False
+        return not public or self.app_in_list(app_label, settings.SHARED_APPS)
+
+
+class CustomTenantSyncRouter:
+    """
+    Reads and writes; migrations are answered by ShardedTenantSyncRouter.
+
+    Apps only in SHARED_APPS (master_db, core, admin, token_blacklist, ...)
+    live on "default" with the User they point at; apps with tenant copies
+    go to the current tenant's shard.
+    """
+
+    _apps = TenantSyncRouter()
 
-class CustomTenantSyncRouter(TenantSyncRouter):
     def db_for_read(self, model, **hints):
-        if model._meta.app_label in settings.SHARED_APPS:
-            return "default"
-        return "tenant_db"
+        primary = self._primary(model)
+        if is_pinned():
+            # Read-your-writes: this request/client wrote recently
+            return primary
+        return replica_monitor.choose(primary)
 
     def db_for_write(self, model, **hints):
-        if model._meta.app_label in settings.SHARED_APPS:
-            return "default"
-        return "tenant_db"
+        mark_write()
+        return self._primary(model)
 
-    def allow_migrate(self, db, app_label, model_name=None, **hints):
-        if db == "default":
-            return app_label in settings.SHARED_APPS
-        elif db == "tenant_db":
-            return app_label in settings.TENANT_APPS
-        return None
\ No newline at end of file
+    def allow_relation(self, obj1, obj2, **hints):
+        # A replica holds the same rows as its primary
+        if get_primary(obj1._state.db) == get_primary(obj2._state.db):
+            return True
+        return None
+
+    def _primary(self, model):
+        if not self._apps.app_in_list(model._meta.app_label, settings.TENANT_APPS):
+            return DEFAULT_DB_ALIAS
+        # The current tenant's shard (set by the middleware / shard_context)
+        return get_current_tenant_db_alias() or settings.TENANT_DATABASE_ALIAS
@@ -12,10 +12,16 @@ env = environ.Env(
     SECRET_KEY=(str, ""),
     MASTER_DATABASE_URL=(str, ""),
     TENANT_DATABASE_URL=(str, ""),
+    TENANT_SHARD_ALIASES=(list, []),
+    MASTER_REPLICA_ALIASES=(list, []),
+    TENANT_REPLICA_ALIASES=(dict, {}),
     JWT_SECRET_KEY=(str, ""),
     ALLOWED_HOSTS=(list, []),
     CORS_ALLOWED_ORIGINS=(list, []),
     CORS_ALLOW_ALL_ORIGINS=(bool, False),
+    TENANT_DATABASE_SSLMODE=(str, "require"),
+    CACHE_URL=(str, "locmemcache://"),
+    TENANT_DEDICATED_DATABASES=(bool, False),
 )
 
 # Assign environment variables
@@ -35,6 +41,7 @@ SHARED_APPS = [
     "django.contrib.staticfiles",
     "django_extensions",
     "rest_framework",
+    "rest_framework_simplejwt.token_blacklist",  # ROTATE_REFRESH_TOKENS + BLACKLIST_AFTER_ROTATION
     "corsheaders",
     "core",
 ]
@@ -53,11 +60,43 @@ TENANT_MODEL = "master_db.Client"
 TENANT_DOMAIN_MODEL = "master_db.Domain"
 PUBLIC_SCHEMA_NAME = "public"
 TENANT_DATABASE_ALIAS = "tenant_db"
+TENANT_DB_ALIAS = TENANT_DATABASE_ALIAS  # the name django-tenants reads (migrate_schemas, schema_exists, ...)
+
+# Per-worker hostname -> tenant cache (see master_db/tenant_cache.py)
+TENANT_CACHE_MAX_SIZE = 1024
+TENANT_CACHE_TTL = 60  # seconds
+TENANT_CACHE_NEGATIVE_TTL = 10  # seconds an unknown hostname stays rejected
+
+# Shared cache: permission version stamps, role listings, /me and the permission
+# catalog live here. Set CACHE_URL (e.g. redis://host:6379/0) when running more
+# than one worker process; the per-process default is for development only.
+CACHES = {"default": env.cache("CACHE_URL")}
+
+# Per-worker compiled permission sets (see core/permission_cache.py)
+PERMISSION_CACHE_MAX_SIZE = 4096
+PERMISSION_CACHE_TTL = 60  # seconds; bounds staleness if CACHES isn't shared
+PERMISSION_CATALOG_CACHE_TTL = 86400  # seconds; rendered permission list, per tenant
+CURRENT_USER_CACHE_TTL = 3600  # seconds; rendered /me payload, per user
+
+# Cached role listings, per tenant (see core/role_groups.py)
+ROLE_LIST_CACHE_TTL = 300  # seconds; changes invalidate immediately
+
+# Database-per-tenant mode: tenants with a db_name get their own database,
+# served through core.middleware.TenantMiddleware (pooled connections) and
+# core.routers.TenantRouter (alias registry); off, both stand aside
+TENANT_DEDICATED_DATABASES = env("TENANT_DEDICATED_DATABASES")
+# Connection pool (see core/tenant_connections.py)
+TENANT_POOL_MAX_CONNECTIONS = 5  # warm connections per tenant database
+TENANT_POOL_TIMEOUT = 5  # seconds to wait for a free connection
+TENANT_DATABASES_MAX_LIVE = 50  # registered tenant aliases; cold ones beyond this are closed LRU-first
+TENANT_DATABASE_SSLMODE = env("TENANT_DATABASE_SSLMODE")  # libpq sslmode for tenant databases
 
 # Middleware
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "sampleDjango.middleware.ReplicaPinningMiddleware",
     "sampleDjango.middleware.CustomTenantMiddleware",
+    "core.middleware.TenantMiddleware",  # only with TENANT_DEDICATED_DATABASES
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -65,13 +104,16 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "sampleDjango.middleware.PasswordHashingBusyMiddleware",  # 429 for the admin login when hashing is saturated
 ]
 
 # Routers
 DATABASE_ROUTERS = [
-    "django_tenants.routers.TenantSyncRouter",  # Required by django-tenants
-    "sampleDjango.routers.CustomTenantSyncRouter",  # Custom router for two-database setup
+    "sampleDjango.routers.ShardedTenantSyncRouter",  # Migrations: master, every shard, tenant databases
+    "core.routers.TenantRouter",  # Reads/writes of tenants with their own database (TENANT_DEDICATED_DATABASES)
+    "sampleDjango.routers.CustomTenantSyncRouter",  # Reads/writes: master, tenant shard, replicas
 ]
+TENANT_SYNC_ROUTER = "sampleDjango.routers.ShardedTenantSyncRouter"  # checked by django-tenants
 
 # Auth
 AUTH_USER_MODEL = "master_db.User"
@@ -82,9 +124,52 @@ DATABASES = {
     "tenant_db": env.db("TENANT_DATABASE_URL"), # tenant DB
 }
 
+# Extra tenant clusters: each alias in TENANT_SHARD_ALIASES reads <ALIAS>_DATABASE_URL
+for shard_alias in env("TENANT_SHARD_ALIASES"):
+    DATABASES[shard_alias] = env.db(f"{shard_alias.upper()}_DATABASE_URL")
+
+# Read replicas, each reading <ALIAS>_DATABASE_URL:
+# MASTER_REPLICA_ALIASES=a,b  and  TENANT_REPLICA_ALIASES=replica_alias=shard_alias,...
+DATABASE_REPLICAS = {"default": env("MASTER_REPLICA_ALIASES")}
+for replica_alias, primary_alias in env("TENANT_REPLICA_ALIASES").items():
+    DATABASE_REPLICAS.setdefault(primary_alias, []).append(replica_alias)
+for primary_alias, replica_aliases in DATABASE_REPLICAS.items():
+    for replica_alias in replica_aliases:
+        DATABASES[replica_alias] = env.db(f"{replica_alias.upper()}_DATABASE_URL")
+        DATABASES[replica_alias]["TEST"] = {"MIRROR": primary_alias}
+
+REPLICA_MAX_LAG = 5  # seconds; lagging replicas are dropped from reads
+REPLICA_CHECK_INTERVAL = 10  # seconds between lag checks per replica
+REPLICA_STICKY_SECONDS = 5  # reads stay on the primary this long after a write
+
 # Correct engines
-DATABASES["default"]["ENGINE"] = "django_tenants.postgresql_backend"
-DATABASES["tenant_db"]["ENGINE"] = "django_tenants.postgresql_backend"
+for db_alias in DATABASES:
+    DATABASES[db_alias]["ENGINE"] = "sampleDjango.postgresql_backend"
+
+# Tenant shards (see master_db/sharding.py); new tenants are placed by the policy below
+TENANT_SHARDS = [TENANT_DATABASE_ALIAS] + env("TENANT_SHARD_ALIASES")
+TENANT_SHARD_PLACEMENT_POLICY = "master_db.sharding.least_loaded_shard"
+
+# Provisioning (see master_db/provisioning.py); refresh with `manage.py refresh_tenant_template`
+TENANT_TEMPLATE_SCHEMA = "tenant_template"
+TENANT_WARM_SCHEMAS = 0  # pre-created schemas kept per shard
+TENANT_LAZY_MIGRATIONS = False  # migrate a schema left behind by a deploy on its first request (others get 503)
+# Database-per-tenant mode: new databases are copied from this one (`manage.py refresh_tenant_template_db`)
+TENANT_TEMPLATE_DATABASE = "tenant_template_db"  # distinct from TENANT_TEMPLATE_SCHEMA
+
+# Provisioning jobs (see master_db/jobs.py); run with `manage.py run_provisioning_jobs`
+PROVISIONING_JOB_CONCURRENCY = 2
+PROVISIONING_JOB_HEARTBEAT_INTERVAL = 30  # seconds between lease refreshes by a runner
+PROVISIONING_JOB_STALE_AFTER = 120  # seconds without a heartbeat before a "running" job is claimed again
+PROVISIONING_JOB_MAX_ATTEMPTS = 3
+
+# Logging: provisioning (schema creation, job outcomes) at INFO on the console
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"tenants.provisioning": {"handlers": ["console"], "level": "INFO"}},
+}
 
 # URLs / WSGI
 ROOT_URLCONF = "sampleDjango.urls"
@@ -107,6 +192,17 @@ TEMPLATES = [
     },
 ]
 
+# Password hashing runs on a bounded pool (see core/password_hashing.py); over capacity -> 429
+PASSWORD_HASHERS = [  # no plain PBKDF2PasswordHasher: it would take over "pbkdf2_sha256" verification
+    "core.password_hashing.OffloadedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_HASHING_WORKERS = None  # default: CPU count
+PASSWORD_HASHING_MAX_QUEUE = 16
+
 # Password validators
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -129,6 +225,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework & JWT
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
+        # core.authentication.ClaimsJWTAuthentication: request.user from token claims,
+        # no User query (needs CACHES shared across workers for the perm_version check)
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
@@ -145,8 +243,14 @@ SIMPLE_JWT = {
     "ALGORITHM": "HS256",
     "SIGNING_KEY": env("JWT_SECRET_KEY", default=SECRET_KEY),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "core.auth_serializers.CustomTokenRefreshSerializer",
 }
 
+# Revoked refresh tokens (see core/revoked_tokens.py); prune with `manage.py prune_tokens`
+REVOKED_TOKEN_FILTER_CAPACITY = 100_000
+REVOKED_TOKEN_SYNC_INTERVAL = 1  # seconds a token revoked by another worker may still pass
+REVOKED_TOKEN_REBUILD_INTERVAL = 3600
+
 # CORS
 CORS_ALLOWED_ORIGINS = env("CORS_ALLOWED_ORIGINS")
 CORS_ALLOW_ALL_ORIGINS = env("CORS_ALLOW_ALL_ORIGINS")
\ No newline at end of file
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core.password_hashing import PasswordHashingBusy
+from core.tenant_context import tenant_scope
+from sampleDjango.middleware import PasswordHashingBusyMiddleware
+from sampleDjango.routers import CustomTenantSyncRouter, ShardedTenantSyncRouter
+
+
+class _Connections(dict):
+    def __missing__(self, alias):
+        return SimpleNamespace(schema_name="public")
+
+
+@override_settings(TENANT_SHARDS=["tenant_db", "shard2"])
+class MigrationRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ShardedTenantSyncRouter()
+        self.connections = _Connections()
+        patcher = mock.patch("sampleDjango.routers.connections", self.connections)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def allow(self, db, app_label, schema="public"):
+        self.connections[db] = SimpleNamespace(schema_name=schema)
+        return self.router.allow_migrate(db, app_label)
+
+    def test_default_takes_shared_apps_in_public_only(self):
+        for app_label in ("master_db", "auth", "contenttypes", "token_blacklist", "core"):
+            self.assertIs(self.allow("default", app_label), True, app_label)
+        self.assertIs(self.allow("default", "tenant_db"), False)
+        self.assertIs(self.allow("default", "master_db", schema="acme"), False)
+
+    def test_every_shard_answers_alike(self):
+        for shard in ("tenant_db", "shard2"):
+            for app_label in ("tenant_db", "auth", "contenttypes", "sessions"):
+                self.assertIs(self.allow(shard, app_label, schema="acme"), True, (shard, app_label))
+            for app_label in ("master_db", "token_blacklist", "core", "admin"):
+                self.assertIs(self.allow(shard, app_label, schema="acme"), False, (shard, app_label))
+                self.assertIs(self.allow(shard, app_label), False, (shard, app_label))
+            # Shared apps with tenant copies also live in the shard's public schema
+            self.assertIs(self.allow(shard, "auth"), True, shard)
+            self.assertIs(self.allow(shard, "tenant_db"), False, shard)
+
+    def test_unknown_aliases_take_nothing(self):
+        self.assertIs(self.allow("tenant_db_replica", "tenant_db", schema="acme"), False)
+        self.assertIs(self.allow("tenant_db_replica", "auth"), False)
+
+
+class ModelRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = CustomTenantSyncRouter()
+
+    def test_shared_only_apps_go_to_default(self):
+        for model in (get_user_model(), OutstandingToken, BlacklistedToken, LogEntry):
+            self.assertEqual(self.router.db_for_write(model), "default", model)
+
+    def test_tenant_apps_go_to_the_current_shard(self):
+        self.assertEqual(self.router.db_for_write(Group), "tenant_db")
+        with tenant_scope(SimpleNamespace(schema_name="acme", shard="shard2", db_name=None)):
+            self.assertEqual(self.router.db_for_write(Group), "shard2")
+
+    def test_outstanding_tokens_may_point_at_users(self):
+        user = get_user_model()(pk=1)
+        token = OutstandingToken(jti="x")
+        user._state.db = self.router.db_for_write(get_user_model())
+        token._state.db = self.router.db_for_write(OutstandingToken)
+        self.assertIs(self.router.allow_relation(token, user), True)
+
+
+class PasswordHashingBusyMiddlewareTests(SimpleTestCase):
+    def test_busy_hashing_is_a_plain_429(self):
+        middleware = PasswordHashingBusyMiddleware(lambda request: None)
+        request = RequestFactory().post("/admin/login/")
+        response = middleware.process_exception(request, PasswordHashingBusy(wait=1))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIsNone(middleware.process_exception(request, ValueError()))
@@ -18,6 +18,12 @@ class Product(TimeStampedModel):
     stock = models.PositiveIntegerField()
     image = models.ImageField(upload_to="products/", null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalog (core.pagination.KeysetPagination)
+            models.Index(fields=["created_at", "id"], name="product_created_id_idx"),
+        ]
+
     @property
     def is_in_stock(self):
         return self.stock > 0